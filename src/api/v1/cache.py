@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+from src.core.local_cache import local_cache
+from src.schemas.cache import CacheStats
+
+
+# Объект router, в котором регистрируем обработчики
+router = APIRouter()
+
+
+@router.get("/stats", response_model=CacheStats)
+async def get_cache_stats() -> CacheStats:
+    """Counters of the in-process cache of the worker that served the request
+
+    Returns:  
+        CacheStats: size, hits, misses and evictions
+    """
+    if local_cache is None:
+        return CacheStats()
+
+    return CacheStats(enabled=True, **local_cache.stats())
@@ -6,10 +6,13 @@ from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Request,
 )
 from sqlalchemy.orm import Session
 
 from src.core import exceptions
+from src.core.config.app_settings import AppSettings
+from src.core.serializers import Serializer
 from src.db.postgresql import get_postgresql
 from src.schemas.comment import (
     CommentFull,
@@ -21,6 +24,10 @@ from src.services.crud.comment import CommentService, get_comment_service
 # Объект router, в котором регистрируем обработчики
 router = APIRouter()
 
+app_config = AppSettings()
+
+comment_full_serializer = Serializer(CommentFull)
+
 
 @router.get("/{comment_id}", response_model=CommentFull)
 async def get_comment(
@@ -36,21 +43,32 @@ async def get_comment(
     Returns:  
         Optional[CommentFull]: comment full data
     """   
-    comment = await service.get(db=db, item_id=comment_id)
+    comment = await service.get_full(db=db, item_id=comment_id)
     if not comment:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Comment not found')
 
-    return comment     
+    return comment_full_serializer.response(comment)
 
 
-@router.post("/", response_model=CommentFull)
+@router.post(
+    "/",
+    response_model=CommentFull,
+    responses={
+        HTTPStatus.ACCEPTED.value: {
+            "model": CommentFull,
+            "description": "Comment is queued (`COMMENT_QUEUE_ENABLED`), it is readable by the `Location` URL",
+        },
+    },
+)
 async def create_comment(
     *,
     comment_in: CommentCreate,
+    request: Request,
     db: Session = Depends(get_postgresql),
     service: CommentService = Depends(get_comment_service),
 ) -> CommentFull:
-    """ Create a new Comment
+    """ Create a new Comment. With the write queue enabled the comment is written asynchronously
+    and the response is `202 Accepted` with the generated ID
 
     Args:
         comment_in (CommentCreate): body request
@@ -60,9 +78,18 @@ async def create_comment(
     """
 
     try:
+        if app_config.comment_queue_enabled:
+            comment = await service.create_queued(db, obj_in=comment_in)
+            return comment_full_serializer.response(
+                comment,
+                status_code=HTTPStatus.ACCEPTED,
+                headers={'Location': request.url_for('get_comment', comment_id=str(comment.id))},
+            )
         return await service.create(db, obj_in=comment_in)
     except exceptions.TicketStatusNotAllowed as error:
         raise HTTPException(status_code=HTTPStatus.METHOD_NOT_ALLOWED, detail=f"{error.message}")
+    except exceptions.ObjectNotFound as error:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"{error.message}")
 
 
 @router.delete("/{comment_id}", response_model=CommentFull)
@@ -84,4 +111,7 @@ async def delete_comment(
     if not comment:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Comment not found')
 
-    return await service.remove(db, item_id=comment_id)
+    try:
+        return await service.remove(db, item_id=comment_id)
+    except exceptions.ObjectNotFound as error:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail=f"{error.message}")
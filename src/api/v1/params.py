@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import Query
+
+from src.models.tickets import TicketStatus
+from src.schemas.ticket import TicketFilter, TicketSort
+
+
+# Класс для параметров страницы: число объектов и номер страницы
+class Page:
+    def __init__(
+            self,
+            size: int = Query(10, alias='page[size]', gt=0, le=100),
+            number: int = Query(0, alias='page[number]', gt=0),
+            after: Optional[str] = Query(
+                None,
+                alias='page[after]',
+                description='Курсор из заголовка `X-Next-Cursor`, пустое значение - первая страница',
+            ),
+    ):
+        self.size = size
+        self.number = number
+        self.after = after
+
+
+def get_ticket_filter(
+        status: Optional[List[TicketStatus]] = Query(None, alias='filter[status]'),
+        active: Optional[bool] = Query(
+            None,
+            alias='filter[active]',
+            description='`true` - тикеты не в статусе `closed` (очередь агентов), `false` - только `closed`',
+        ),
+        email: Optional[str] = Query(None, alias='filter[email]'),
+        created_by: Optional[str] = Query(None, alias='filter[created_by]'),
+        created_from: Optional[datetime] = Query(None, alias='filter[created_at][gte]'),
+        created_to: Optional[datetime] = Query(None, alias='filter[created_at][lt]'),
+        updated_from: Optional[datetime] = Query(None, alias='filter[updated_at][gte]'),
+        updated_to: Optional[datetime] = Query(None, alias='filter[updated_at][lt]'),
+        sort: TicketSort = Query(TicketSort.CREATED_AT, description='Поле сортировки, `-` - по убыванию'),
+) -> TicketFilter:
+    """Parameters `filter[...]` and `sort` of the tickets list, the service gets a plain schema"""
+    return TicketFilter(
+        status=status,
+        active=active,
+        email=email,
+        created_by=created_by,
+        created_from=created_from,
+        created_to=created_to,
+        updated_from=updated_from,
+        updated_to=updated_to,
+        sort=sort,
+    )
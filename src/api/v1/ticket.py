@@ -1,72 +1,362 @@
-from typing import List, Optional
+import csv
+import enum
+import io
+from datetime import datetime
+from typing import List, Optional, Any, AsyncIterator, Dict, Tuple
 from uuid import UUID
 from http import HTTPStatus
 
+import orjson
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
+    Query,
+    Request,
+    Response,
 )
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from src.core import exceptions
-from src.core.modules import Page
+from src.core.config.app_settings import AppSettings
+from src.core.events import broker
+from src.api.v1.params import Page, get_ticket_filter
+from src.core.modules import etag_matches, etag_version
+from src.core.serializers import Serializer
 from src.db.postgresql import get_postgresql
 from src.schemas.ticket import (
+    ExportFormat,
+    ExportInclude,
     Ticket,
     TicketFull,
     TicketCreate,
     TicketUpdate,
+    TicketBulkError,
+    TicketBulkResult,
+    TicketFilter,
+    TicketSearchResult,
+    TicketStats,
+    TicketHistory,
 )
+from src.schemas.comment import Comment
+from src.services.crud.comment import CommentService, get_comment_service
 from src.services.crud.ticket import TicketService, get_ticket_service
 
 
 # Объект router, в котором регистрируем обработчики
 router = APIRouter()
+app_config = AppSettings()
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+CSV_MEDIA_TYPE = 'text/csv'
+EVENT_STREAM_MEDIA_TYPE = 'text/event-stream'
+# Прокси не должны кэшировать и буферизовать поток событий
+EVENT_STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+BATCH_MAX_IDS = 100
+# Сколько строк выгрузки отправляется клиенту одним блоком
+EXPORT_CHUNK_ROWS = 500
+
+# Ответы собираются без повторной валидации, `response_model` роутов остается для документации
+ticket_full_serializer = Serializer(TicketFull)
+ticket_history_serializer = Serializer(TicketHistory)
+comment_serializer = Serializer(Comment)
+
+
+async def ndjson_chunks(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    lines = []
+    async for row in rows:
+        lines.append(orjson.dumps(row))     # pylint: disable=no-member
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def csv_value(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()     # pylint: disable=no-member
+    return value
+
+
+async def csv_chunks(rows: AsyncIterator[Dict[str, Any]], fields: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    count = 0
+    async for row in rows:
+        writer.writerow([csv_value(row[field]) for field in fields])
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+@router.get("/stats", response_model=TicketStats)
+async def get_tickets_stats(
+    *,
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> TicketStats:
+    """Number of tickets by status
+
+    Returns:  
+        TicketStats: counters by status
+    """
+    return await service.get_stats(db)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_tickets(
+    *,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias='format'),
+    include: Optional[ExportInclude] = Query(None, description='`comments` - все комментарии тикета JSON-массивом'),
+    ticket_filter: TicketFilter = Depends(get_ticket_filter),
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> StreamingResponse:
+    """Stream all tickets matching the filters as NDJSON or CSV, without pagination
+
+    Args:  
+        export_format (ExportFormat, optional): `ndjson` or `csv`  
+        include (Optional[ExportInclude]): `comments` to add ticket comments  
+        ticket_filter (TicketFilter, optional): `filter[...]` parameters and `sort` order  
+
+    Returns:  
+        StreamingResponse: tickets, one per line
+    """
+    include_comments = include == ExportInclude.COMMENTS
+    rows = service.export(db, ticket_filter=ticket_filter, include_comments=include_comments)
+    if export_format == ExportFormat.CSV:
+        return StreamingResponse(
+            csv_chunks(rows, service.export_fields(include_comments)),
+            media_type=CSV_MEDIA_TYPE,
+            headers={'Content-Disposition': 'attachment; filename="tickets.csv"'},
+        )
+
+    return StreamingResponse(ndjson_chunks(rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def ticket_events(*, request: Request) -> StreamingResponse:
+    """Server-Sent Events of all tickets: `ticket.updated`, `ticket.removed` and `comment.created`.
+    Replaces polling of the tickets list, `: keepalive` comments are sent while there are no events
+
+    Returns:  
+        StreamingResponse: `text/event-stream`, `data` is JSON of the ticket, comment or `{"id": ...}`
+    """
+    return StreamingResponse(
+        broker.stream(None, request.is_disconnected),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers=EVENT_STREAM_HEADERS,
+    )
+
+
+@router.get("/search", response_model=List[TicketSearchResult])
+async def search_tickets(
+    *,
+    q: str = Query(..., min_length=1, description='Поисковый запрос: слова, "фраза", -исключение, or'),
+    page: Page = Depends(),
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> List[TicketSearchResult]:
+    """Full-text search by ticket title, description and comments
+
+    Args:  
+        q (str): search query  
+        page (Page, optional): page size and page number  
+
+    Returns:  
+        List[TicketSearchResult]: tickets ordered by rank
+    """
+    return await service.search(db, query=q, skip=page.number, limit=page.size)
+
+
+@router.get("/batch", response_model=List[TicketFull])
+async def get_tickets_batch(
+    *,
+    ids: List[str] = Query(..., description='ID тикетов: `?ids=<id>&ids=<id>` или `?ids=<id>,<id>`'),
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> List[TicketFull]:
+    """Get many tickets by ID
+
+    Args:  
+        ids (List[str]): tickets IDs  
+
+    Returns:  
+        List[TicketFull]: found tickets in the order of IDs, missing IDs are skipped
+    """
+    try:
+        tickets_ids = [UUID(ticket_id) for value in ids for ticket_id in value.split(',') if ticket_id]
+    except ValueError:
+        raise HTTPException(status_code=HTTPStatus.UNPROCESSABLE_ENTITY, detail='invalid ticket ID')
+
+    if len(tickets_ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+            detail=f'no more than {BATCH_MAX_IDS} IDs per request',
+        )
+
+    return ticket_full_serializer.response(await service.get_many_full(db, tickets_ids), many=True)
 
 
 @router.get("/{ticket_id}", response_model=TicketFull)
 async def get_ticket(
     *,
     ticket_id: UUID,
+    as_of: Optional[datetime] = Query(None, description='Состояние тикета на момент времени (UTC)'),
+    request: Request,
     db: Session = Depends(get_postgresql),
     service: TicketService = Depends(get_ticket_service),
 ) -> Optional[TicketFull]:
-    """Get ticket by ID
+    """Get ticket by ID, the current state is returned with `ETag`,
+    a matching `If-None-Match` gets an empty 304 response
 
     Args:  
         ticket_id (UUID): ticket ID  
+        as_of (Optional[datetime]): rebuild ticket state at this moment from the history  
 
     Returns:  
         Optional[TicketFull]: Ticket full data
     """   
-    ticket = await service.get(db=db, item_id=ticket_id)
-    if not ticket:
+    if as_of:
+        ticket = await service.get_as_of(db, item_id=ticket_id, as_of=as_of)
+        if not ticket:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
+        return ticket_full_serializer.response(ticket)
+
+    # Готовые байты из кэша отдаются как есть, `response_model` остается только для документации
+    cached = await service.get_full_response(db=db, item_id=ticket_id)
+    if not cached:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
 
-    return ticket     
+    etag, body = cached
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={'ETag': etag})
+
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
+
+
+@router.get("/{ticket_id}/events", response_class=StreamingResponse)
+async def ticket_events_by_id(
+    *,
+    ticket_id: UUID,
+    request: Request,
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> StreamingResponse:
+    """Server-Sent Events of one ticket, see `GET /events`
+
+    Args:  
+        ticket_id (UUID): ticket ID  
+
+    Returns:  
+        StreamingResponse: `text/event-stream` of the ticket changes
+    """
+    if not await service.get_full_response(db=db, item_id=ticket_id):
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
+
+    return StreamingResponse(
+        broker.stream(str(ticket_id), request.is_disconnected),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers=EVENT_STREAM_HEADERS,
+    )
+
+
+@router.get("/{ticket_id}/history", response_model=List[TicketHistory])
+async def list_ticket_history(
+    *,
+    ticket_id: UUID,
+    page: Page = Depends(),
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> List[TicketHistory]:
+    """Get previous versions of the ticket, oldest first
+
+    Args:  
+        ticket_id (UUID): ticket ID  
+        page (Page, optional): page size and `page[after]` cursor  
+
+    Returns:  
+        List[TicketHistory]: ticket versions, cursor of the next page is in `X-Next-Cursor` header
+    """
+    try:
+        versions, next_cursor = await service.history(
+            db, item_id=ticket_id, after=page.after, limit=page.size
+        )
+    except exceptions.InvalidCursor as error:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"{error.message}")
+
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+    return ticket_history_serializer.response(versions, many=True, headers=headers)
+
+
+@router.get("/{ticket_id}/comments", response_model=List[Comment])
+async def list_ticket_comments(
+    *,
+    ticket_id: UUID,
+    page: Page = Depends(),
+    db: Session = Depends(get_postgresql),
+    service: CommentService = Depends(get_comment_service),
+) -> List[Comment]:
+    """Get ticket comments, oldest first
+
+    Args:  
+        ticket_id (UUID): ticket ID  
+        page (Page, optional): page size and `page[after]` cursor  
+
+    Returns:  
+        List[Comment]: List of comments, cursor of the next page is in `X-Next-Cursor` header
+    """
+    try:
+        comments, next_cursor = await service.list_for_ticket(
+            db, ticket_id=ticket_id, after=page.after, limit=page.size
+        )
+    except exceptions.InvalidCursor as error:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"{error.message}")
+
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+    return comment_serializer.response(comments, many=True, headers=headers)
 
 
 @router.get("/", response_model=List[Ticket])
 async def list_tickets(
     *,
     page: Page = Depends(),
+    ticket_filter: TicketFilter = Depends(get_ticket_filter),
     db: Session = Depends(get_postgresql),
     service: TicketService = Depends(get_ticket_service),
 ) -> Optional[List[Ticket]]:
     """Get tickets list
 
     Args:  
-        page (Page, optional): page size and page limits  
+        page (Page, optional): page size and page limits, `page[after]` switches to cursor pagination  
+        ticket_filter (TicketFilter, optional): `filter[...]` parameters and `sort` order  
 
     Returns:  
-        Optional[List[Ticket]]: List of tickets
+        Optional[List[Ticket]]: List of tickets, cursor of the next page is in `X-Next-Cursor` header
     """
-    tickets = await service.list(db, skip=page.number, limit=page.size)
-    if not tickets:
+    try:
+        tickets_page = await service.list_page(
+            db, skip=page.number, limit=page.size, after=page.after, ticket_filter=ticket_filter,
+        )
+    except exceptions.InvalidCursor as error:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"{error.message}")
+
+    if not tickets_page.items:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='tickets not found')
 
-    return tickets      # type: ignore
+    # Страница уже состоит из словарей схемы `Ticket`
+    headers = {'X-Next-Cursor': tickets_page.next_cursor} if tickets_page.next_cursor else None
+    return ORJSONResponse(content=tickets_page.items, headers=headers)
 
 
 @router.post("/", response_model=TicketFull)
@@ -88,15 +378,93 @@ async def create_ticket(
     return await service.create(db, obj_in=ticket_in)
 
 
+def too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+def parse_bulk_tickets(
+        body: bytes, ndjson: bool,
+) -> Tuple[int, List[Tuple[int, TicketCreate]], List[TicketBulkError]]:
+    """Decode and validate the body of `POST /bulk`, runs in the thread pool
+
+    Returns:
+        Tuple[int, List[Tuple[int, TicketCreate]], List[TicketBulkError]]: number of items,
+            valid tickets with their indexes and validation errors
+    """
+    items: List[Any]
+    try:
+        if ndjson:
+            items = [line for line in body.splitlines() if line.strip()]
+        else:
+            items = orjson.loads(body)      # pylint: disable=no-member
+    except orjson.JSONDecodeError as error:     # pylint: disable=no-member
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f"{error}")
+
+    if not isinstance(items, list):
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='expected a list of tickets')
+    if len(items) > app_config.ticket_bulk_max_items:
+        raise too_large(f'at most {app_config.ticket_bulk_max_items} tickets per request')
+
+    valid = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            ticket_in = TicketCreate.parse_raw(item) if isinstance(item, bytes) else TicketCreate.parse_obj(item)
+        except ValidationError as error:
+            errors.append(TicketBulkError(index=index, errors=error.errors()))
+        else:
+            valid.append((index, ticket_in))
+    return len(items), valid, errors
+
+
+@router.post("/bulk", response_model=TicketBulkResult)
+async def create_tickets_bulk(
+    *,
+    request: Request,
+    db: Session = Depends(get_postgresql),
+    service: TicketService = Depends(get_ticket_service),
+) -> TicketBulkResult:
+    """Create many tickets in a single transaction
+
+    Body is a JSON list of `TicketCreate` objects or NDJSON (`Content-Type: application/x-ndjson`)
+    with one `TicketCreate` object per line. Invalid items are skipped and reported in `errors`.
+    More than `TICKET_BULK_MAX_ITEMS` items or `TICKET_BULK_MAX_BODY_BYTES` bytes is answered with 413.
+
+    Returns:
+        TicketBulkResult: IDs of created tickets and validation errors by item index
+    """
+    max_bytes = app_config.ticket_bulk_max_body_bytes
+    if int(request.headers.get('content-length') or 0) > max_bytes:
+        raise too_large(f'request body is larger than {max_bytes} bytes')
+    # Без `Content-Length` (chunked) размер проверяется по мере чтения
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise too_large(f'request body is larger than {max_bytes} bytes')
+
+    ndjson = request.headers.get('content-type', '').startswith(NDJSON_MEDIA_TYPE)
+    count, valid, errors = await run_in_threadpool(parse_bulk_tickets, bytes(body), ndjson)
+
+    ids: List[Optional[UUID]] = [None] * count
+    created = await service.create_many(db, objs_in=[ticket_in for _, ticket_in in valid])
+    for (index, _), ticket_id in zip(valid, created):
+        ids[index] = ticket_id
+
+    return TicketBulkResult(ids=ids, errors=errors)
+
+
 @router.put("/{ticket_id}", response_model=TicketFull)
 async def update_ticket(
     *,
     ticket_id: UUID,
     ticket_in: TicketUpdate,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_postgresql),
     service: TicketService = Depends(get_ticket_service),
 ) -> Optional[TicketFull]:
-    """Update ticket
+    """Update ticket, with `If-Match` the update is applied only to that version of the ticket
 
     Args:
         ticket_id (UUID): ticket ID  
@@ -104,15 +472,32 @@ async def update_ticket(
     Returns:
         Optional[TicketFull]: Ticket full data
     """
+    expected_version = None
+    if_match = request.headers.get('If-Match')
+    if if_match and if_match.strip() != '*':
+        versions = {etag_version(tag) for tag in if_match.split(',')}
+        if len(versions) != 1 or None in versions:
+            raise HTTPException(status_code=HTTPStatus.PRECONDITION_FAILED, detail='If-Match must be a single ticket ETag')
+        expected_version, = versions
+
     ticket = await service.get(db, item_id=ticket_id)
     if not ticket:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
 
     try:
-        return await service.update(db, db_obj=ticket, obj_in=ticket_in)
+        await service.update(db, db_obj=ticket, obj_in=ticket_in, expected_version=expected_version)
+    except exceptions.PreconditionFailed as error:
+        # Без `If-Match` тикет изменился между чтением и записью: переход статуса проверялся по старой версии
+        status_code = HTTPStatus.PRECONDITION_FAILED if expected_version is not None else HTTPStatus.CONFLICT
+        raise HTTPException(status_code=status_code, detail=f"{error.message}")
     except exceptions.TicketStatusNotAllowed as error:
         raise HTTPException(status_code=HTTPStatus.METHOD_NOT_ALLOWED, detail=f"{error.message}")
 
+    ticket_full = await service.get_full(db, item_id=ticket_id)
+    if ticket_full:
+        response.headers['ETag'] = service.etag(ticket_full)
+    return ticket_full
+
 
 @router.delete("/{ticket_id}", response_model=TicketFull)
 async def delete_ticket(
@@ -129,8 +514,13 @@ async def delete_ticket(
     Returns:
         TicketFull: Ticket full data
     """
-    ticket = await service.get(db, item_id=ticket_id)
+    ticket = await service.get_full(db, item_id=ticket_id)
     if not ticket:
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
 
-    return await service.remove(db, item_id=ticket_id)
+    try:
+        await service.remove(db, item_id=ticket_id)
+    except exceptions.ObjectNotFound:
+        # Тикет удален параллельным запросом
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='ticket not found')
+    return ticket
@@ -0,0 +1,142 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+import msgpack
+import orjson
+import zstandard
+
+
+# Версия формата значений в кэше. Увеличивается при несовместимом изменении
+# схем или кодеков: старые значения после деплоя считаются промахом
+CACHE_SCHEMA_VERSION = 3
+
+# Флаг сжатия во втором байте заголовка
+COMPRESSED_FLAG = 0x80
+
+
+class Codec(ABC):
+    """Serializer of plain python objects (dicts, lists, UUID, datetime) to bytes"""
+    codec_id: int
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        ...
+
+
+class OrjsonCodec(Codec):
+    codec_id = 1
+    name = "orjson"
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)            # pylint: disable=no-member
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)           # pylint: disable=no-member
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """Types unknown to msgpack are stored the same way as in JSON"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+class MsgpackCodec(Codec):
+    codec_id = 2
+    name = "msgpack"
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=_msgpack_default)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+CODECS: Dict[int, Callable[[], Codec]] = {
+    OrjsonCodec.codec_id: OrjsonCodec,
+    MsgpackCodec.codec_id: MsgpackCodec,
+}
+
+
+class CacheSerializer:
+    """
+        Encodes cache values as `<schema version><codec id | compressed flag><payload>`.
+        Values are decoded with the codec from their own header, so the codec can be
+        switched without flushing the cache, while values of another schema version
+        (or written by the old pickle format) are treated as a miss.
+    """
+
+    def __init__(self, codec: str = OrjsonCodec.name, compress_min_size: Optional[int] = None):
+        """
+        Args:
+            codec (str): codec name for new values, `orjson` or `msgpack`
+            compress_min_size (Optional[int]): compress payloads from this size with zstd,
+                `None` - never compress
+        """
+        codecs = {factory.name: factory for factory in CODECS.values()}     # type: ignore
+        if codec not in codecs:
+            raise ValueError(f"Unknown cache codec: {codec}")
+
+        self.codec = codecs[codec]()
+        self.compress_min_size = compress_min_size
+        self._codecs: Dict[int, Codec] = {self.codec.codec_id: self.codec}
+
+    def _get_codec(self, codec_id: int) -> Optional[Codec]:
+        if codec_id not in self._codecs:
+            if codec_id not in CODECS:
+                return None
+            self._codecs[codec_id] = CODECS[codec_id]()
+        return self._codecs[codec_id]
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode a plain python object into a cache value
+
+        Args:
+            obj (Any): dict, list or scalar, e.g. result of `BaseModel.dict()`
+
+        Returns:
+            bytes: value with the header
+        """
+        payload = self.codec.dumps(obj)
+        flags = self.codec.codec_id
+        if self.compress_min_size is not None and len(payload) >= self.compress_min_size:
+            payload = zstandard.ZstdCompressor().compress(payload)
+            flags |= COMPRESSED_FLAG
+
+        return bytes((CACHE_SCHEMA_VERSION, flags)) + payload
+
+    def loads(self, data: Optional[bytes]) -> Optional[Any]:
+        """Decode a cache value made by `dumps`
+
+        Args:
+            data (Optional[bytes]): raw value from Redis
+
+        Returns:
+            Optional[Any]: decoded object, `None` for missing, stale or broken values
+        """
+        if not data or len(data) < 2 or data[0] != CACHE_SCHEMA_VERSION:
+            return None
+
+        codec = self._get_codec(data[1] & ~COMPRESSED_FLAG)
+        if codec is None:
+            return None
+
+        payload = data[2:]
+        try:
+            if data[1] & COMPRESSED_FLAG:
+                payload = zstandard.ZstdDecompressor().decompress(payload)
+            return codec.loads(payload)
+        except Exception:                   # pylint: disable=broad-except
+            return None
@@ -8,6 +8,32 @@ class AppSettings(BaseSettings):
     app_name: str = "Ticketing Service"
     app_version: str = "0.1.0"
 
+    # Сколько последних комментариев встраивается в ответ с тикетом
+    ticket_comments_limit: int = 10
+
+    # Очередь записи комментариев (Redis Stream): POST комментария отвечает 202,
+    # фоновый потребитель каждого воркера пишет комментарии в базу пачками
+    comment_queue_enabled: bool = False
+    comment_queue_batch_size: int = 500
+    comment_queue_block_ms: int = 1000
+    # Через сколько миллисекунд неподтвержденное сообщение забирает другой потребитель
+    # и после скольких доставок оно уходит в поток недоставленных
+    comment_queue_claim_idle_ms: int = 30000
+    comment_queue_max_deliveries: int = 5
+    # Сколько комментарий из очереди читается по ID до записи в базу
+    comment_queue_pending_ttl_seconds: int = 3600
+
+    # Подписки SSE на изменения тикетов: интервал keepalive, через сколько миллисекунд
+    # переподключается клиент и сколько событий ждет медленного клиента до его отключения
+    events_keepalive_seconds: float = 15
+    events_retry_ms: int = 3000
+    events_queue_size: int = 100
+
+    # Пакетное создание тикетов: больше элементов или байт тела - ответ 413,
+    # чтобы один запрос не занимал память и цикл событий воркера
+    ticket_bulk_max_items: int = 1000
+    ticket_bulk_max_body_bytes: int = 4 * 1024 * 1024
+
     db: DBSettings = Field(default_factory=DBSettings)
     redis_db: RedisSettings = Field(default_factory=RedisSettings)
 
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import (
     BaseSettings,
     PostgresDsn,
@@ -7,5 +8,13 @@ from pydantic import (
 class DBSettings(BaseSettings):
     pg_dsn: PostgresDsn
 
+    # Использовать неблокирующий CRUD поверх пула `databases` (asyncpg) вместо `Session`
+    async_crud: bool = False
+
+    # Секции `tickets_history` по месяцам: сколько месяцев создавать заранее
+    # и сколько хранить (`None` - хранить всегда)
+    history_partitions_ahead: int = 3
+    history_retention_months: Optional[int] = None
+
     class Config:
         env_prefix = 'DATABASE_'
@@ -10,7 +10,33 @@ class RedisSettings(BaseSettings):
     port: str
     cache_dsn: Optional[RedisDsn]
 
-    CACHE_EXPIRE_IN_SECONDS: int = 300
+    # Записи кэша инвалидируются при изменении объектов, от которых они зависят,
+    # поэтому время жизни ограничивает только объем памяти
+    CACHE_EXPIRE_IN_SECONDS: int = 3600
+    # Значение, загруженное из базы, записывается, только если его сущности не сбрасывались
+    # с начала загрузки: отметки сброса хранятся столько секунд, загрузка дольше не кэшируется
+    CACHE_FILL_GUARD_SECONDS: float = 30
+    # Страницы списков устаревают целиком при любом изменении коллекции, долго хранить их незачем
+    CACHE_LIST_EXPIRE_IN_SECONDS: int = 300
+    # Записи "не найдено": сбрасываются при создании объекта, короткий TTL ограничивает
+    # ответ 404 для объекта, созданного одновременно с его загрузкой
+    CACHE_NEGATIVE_EXPIRE_IN_SECONDS: int = 30
+
+    # Кодек значений в кэше (`orjson` или `msgpack`) и размер, начиная с которого
+    # значение сжимается zstd (`None` - не сжимать)
+    CACHE_CODEC: str = "orjson"
+    CACHE_COMPRESS_MIN_SIZE: Optional[int] = 1024
+
+    # Кэш внутри процесса воркера перед Redis: число объектов (0 - выключен) и время жизни.
+    # Воркеры сбрасывают его друг у друга через pub/sub, TTL страхует от потерянных сообщений
+    LOCAL_CACHE_SIZE: int = 0
+    LOCAL_CACHE_TTL_SECONDS: float = 30
+
+    # Защита от лавины промахов: время жизни блокировки загрузки ключа, сколько остальные
+    # воркеры ждут значение от ее владельца и коэффициент раннего обновления XFetch (0 - выключено)
+    CACHE_LOCK_TIMEOUT_SECONDS: float = 5
+    CACHE_LOCK_WAIT_SECONDS: float = 1
+    CACHE_EARLY_REFRESH_BETA: float = 1.0
 
     def __init__(self, **data):
         super(RedisSettings, self).__init__(**data)
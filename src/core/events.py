@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+import orjson
+from aioredis import Redis
+from aioredis.exceptions import RedisError
+
+from src.core.config.app_settings import AppSettings
+
+
+app_config = AppSettings()
+log = logging.getLogger(__name__)
+
+# Канал изменений тикетов и их комментариев, общий для всех воркеров
+TICKET_EVENTS_CHANNEL = 'events:tickets'
+
+# Пауза перед переподключением к каналу после обрыва соединения
+RECONNECT_DELAY_SECONDS = 1
+
+# Комментарий SSE: не дает прокси закрыть простаивающее соединение
+KEEPALIVE_FRAME = b': keepalive\n\n'
+
+
+def ticket_event(event: str, ticket_id: Any, data: Any) -> bytes:
+    """Message of `TICKET_EVENTS_CHANNEL`, to publish it in a pipeline
+
+    Args:
+        event (str): event name, e.g. `ticket.updated`
+        ticket_id (Any): ID of the changed ticket
+        data (Any): orjson-serializable event data
+
+    Returns:
+        bytes: encoded message
+    """
+    return orjson.dumps({"event": event, "ticket_id": str(ticket_id), "data": data})   # pylint: disable=no-member
+
+
+async def publish_ticket_event(redis: Optional[Redis], event: str, ticket_id: Any, data: Any) -> None:
+    """Notify subscribers of all workers about a committed change, see `ticket_event`
+
+    Args:
+        redis (Optional[Redis]): connection, `None` - events are off
+    """
+    if redis is None:
+        return
+
+    await redis.publish(TICKET_EVENTS_CHANNEL, ticket_event(event, ticket_id, data))
+
+
+class EventBroker:
+    """
+        Single Redis subscription of the worker fanned out to in-process queues of SSE clients.
+        An event is encoded once for all its subscribers, an idle subscriber costs one queue
+        and a waiting coroutine. A subscriber that doesn't keep up is disconnected,
+        the client reconnects and reloads the state.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        # Подписчики по ID тикета, `None` - подписчики всех тикетов
+        self._subscribers: Dict[Optional[str], Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, ticket_id: Optional[str] = None) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[ticket_id].add(queue)
+        return queue
+
+    def unsubscribe(self, ticket_id: Optional[str], queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(ticket_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[ticket_id]
+
+    def dispatch(self, message: bytes) -> None:
+        if not self._subscribers:
+            return
+
+        event = orjson.loads(message)                   # pylint: disable=no-member
+        frame = b'event: %s\ndata: %s\n\n' % (
+            event["event"].encode(), orjson.dumps(event["data"]),     # pylint: disable=no-member
+        )
+        for key in (event["ticket_id"], None):
+            for queue in list(self._subscribers.get(key, ())):
+                try:
+                    queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    self.close(key, queue)
+
+    def close(self, ticket_id: Optional[str], queue: asyncio.Queue) -> None:
+        """Disconnect a subscriber: its pending events are dropped, `None` ends the stream"""
+        self.unsubscribe(ticket_id, queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def close_all(self) -> None:
+        for ticket_id, subscribers in list(self._subscribers.items()):
+            for queue in list(subscribers):
+                self.close(ticket_id, queue)
+
+    async def listen(self, redis: Redis) -> None:
+        """Background task: receive events of all workers and dispatch them to the subscribers.
+        Events published while the channel is disconnected are lost, so subscribers are
+        disconnected too and reload the state on reconnect."""
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(TICKET_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as error:
+                log.warning("Ticket events channel is disconnected: %s", error)
+                self.close_all()
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+            finally:
+                await pubsub.close()
+
+    async def stream(
+        self, ticket_id: Optional[str], is_disconnected: Callable[[], Awaitable[bool]]
+    ) -> AsyncIterator[bytes]:
+        """SSE frames for a client: events of one ticket or of all tickets (`ticket_id=None`)
+
+        Args:
+            ticket_id (Optional[str]): ticket ID, `None` - all tickets
+            is_disconnected (Callable[[], Awaitable[bool]]): `Request.is_disconnected`, checked between keepalives
+
+        Returns:
+            AsyncIterator[bytes]: body of a `text/event-stream` response
+        """
+        queue = self.subscribe(ticket_id)
+        try:
+            # Клиент сразу получает ответ, а EventSource переподключается через `retry` мс
+            yield b'retry: %d\n\n' % (app_config.events_retry_ms,)
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), app_config.events_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        break
+                    yield KEEPALIVE_FRAME
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            self.unsubscribe(ticket_id, queue)
+
+
+# Брокер воркера, слушает канал с момента старта приложения
+broker = EventBroker(app_config.events_queue_size)
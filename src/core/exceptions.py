@@ -14,3 +14,42 @@ class TicketStatusNotAllowed(Error):
         self.expression = expression
         self.message = message
         super().__init__(self.message)
+
+
+class ObjectNotFound(Error):
+    """Exception raised when a related object doesn't exist.
+
+        Attributes:
+            expression -- input expression in which the error occurred
+            message -- explanation of the error
+        """
+    def __init__(self, expression, message):
+        self.expression = expression
+        self.message = message
+        super().__init__(self.message)
+
+
+class InvalidCursor(Error):
+    """Exception raised for malformed pagination cursors.
+
+        Attributes:
+            expression -- input expression in which the error occurred
+            message -- explanation of the error
+        """
+    def __init__(self, expression, message):
+        self.expression = expression
+        self.message = message
+        super().__init__(self.message)
+
+
+class PreconditionFailed(Error):
+    """Exception raised when `If-Match` doesn't match the current object version.
+
+        Attributes:
+            expression -- input expression in which the error occurred
+            message -- explanation of the error
+        """
+    def __init__(self, expression, message):
+        self.expression = expression
+        self.message = message
+        super().__init__(self.message)
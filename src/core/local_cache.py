@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import orjson
+from aioredis import Redis
+from aioredis.exceptions import RedisError
+
+from src.core.config.app_settings import AppSettings
+
+
+app_config = AppSettings()
+log = logging.getLogger(__name__)
+
+# Канал, через который воркеры сообщают друг другу об измененных ключах
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+# Пауза перед переподключением к каналу после обрыва соединения
+RECONNECT_DELAY_SECONDS = 1
+
+
+class LocalCache:
+    """
+        Bounded LRU with TTL kept inside the worker process in front of Redis.
+        Stores already parsed objects, so a hit costs neither a round trip nor decoding.
+        Callers must not mutate returned objects.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: str, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Кэш воркера, `None` - L1 выключен (`REDIS_LOCAL_CACHE_SIZE=0`)
+local_cache: Optional[LocalCache] = (
+    LocalCache(app_config.redis_db.LOCAL_CACHE_SIZE, app_config.redis_db.LOCAL_CACHE_TTL_SECONDS)
+    if app_config.redis_db.LOCAL_CACHE_SIZE > 0 else None
+)
+
+
+async def listen_invalidations(redis: Redis) -> None:
+    """Background task: apply invalidations published by any worker to the local cache.
+
+    While disconnected from the channel invalidations are lost, so the local cache
+    is cleared on every (re)subscription.
+    """
+    if local_cache is None:
+        return
+
+    while True:
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_cache.delete(orjson.loads(message["data"]))   # pylint: disable=no-member
+        except asyncio.CancelledError:
+            raise
+        except (RedisError, OSError) as error:
+            log.warning("Cache invalidation channel is disconnected: %s", error)
+            local_cache.clear()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+        finally:
+            await pubsub.close()
@@ -1,8 +1,13 @@
-import json
-import pickle
+import asyncio
+import base64
+import hashlib
+import math
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
 
-from fastapi import Query
-from fastapi.encoders import jsonable_encoder
+import orjson
 from pydantic import BaseModel
 from typing import (
     TypeVar,
@@ -10,9 +15,19 @@ from typing import (
     List,
     Dict,
     Any,
+    Sequence,
+    Type,
+    Iterable,
+    Callable,
+    Awaitable,
+    Tuple,
+    AsyncIterator,
 )
 
 from src.db.postgresql import Base
+from src.core import exceptions
+from src.core.codecs import CacheSerializer, CACHE_SCHEMA_VERSION
+from src.core.local_cache import local_cache, INVALIDATION_CHANNEL
 from src.core.config.app_settings import AppSettings
 
 
@@ -21,41 +36,209 @@ ModelType = TypeVar("ModelType", bound=Base)
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
 
 
-# Класс для параметров страницы: число объектов и номер страницы
-class Page:
-    def __init__(
-            self,
-            size: int = Query(10, alias='page[size]', gt=0, le=100),
-            number: int = Query(0, alias='page[number]', gt=0),
-    ):
-        self.size = size
-        self.number = number
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Pack values of the last item on the page into an opaque cursor
+
+    Args:
+        values (Sequence[Any]): values of the ordering columns
+
+    Returns:
+        str: cursor for `page[after]`
+    """
+    return base64.urlsafe_b64encode(orjson.dumps(list(values))).decode()   # pylint: disable=no-member
 
 
-async def prepare_list_items_to_cache(objs: List[SchemaType]):
+def decode_cursor(cursor: str) -> List[Any]:
+    """Unpack cursor made by `encode_cursor`
+
+    Args:
+        cursor (str): cursor from `page[after]`
+
+    Returns:
+        List[Any]: values of the ordering columns
     """
-    Transform non-valid data from Pydantic model to Redis
-    :param objs: list of pydantic models
-    :return: list of transformed data
+    try:
+        values = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))    # pylint: disable=no-member
+    except ValueError as error:
+        raise exceptions.InvalidCursor(cursor, "Invalid page cursor") from error
+
+    if not isinstance(values, list):
+        raise exceptions.InvalidCursor(cursor, "Invalid page cursor")
+
+    return values
+
+
+def make_etag(obj_id: Any, version: Optional[int], *fingerprint: Any) -> str:
+    """Strong ETag `"<id>-<version>-<digest>"`, the digest covers embedded data
+    that changes without a new version (e.g. comments of a ticket)
+
+    Args:
+        obj_id (Any): object ID
+        version (Optional[int]): object version
+        fingerprint (Any): values identifying the embedded data
+
+    Returns:
+        str: quoted ETag
+    """
+    digest = hashlib.sha1(orjson.dumps([str(value) for value in fingerprint])).hexdigest()[:16]   # pylint: disable=no-member
+    return f'"{obj_id}-{version}-{digest}"'
+
+
+def etag_version(etag: str) -> Optional[int]:
+    """Version from an ETag made by `make_etag`, `None` for foreign ETags"""
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    parts = etag.strip('"').rsplit('-', 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Whether `If-None-Match`/`If-Match` header lists the ETag (weak comparison)
+
+    Args:
+        header (Optional[str]): header value: `*` or comma separated ETags
+        etag (str): current ETag
+
+    Returns:
+        bool: the ETag matches
     """
-    obj_list = []
-    types = [str, list, int]
-    for obj in objs:
-        obj = obj.dict()                                # type: ignore
-        for key in obj.keys():                          # type: ignore
-            if isinstance(types, type(obj[key])):       # type: ignore
-                obj[key] = str(obj[key])                # type: ignore
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
 
-        obj_list.append(obj)
 
-    return obj_list
+# Снимает только свои блокировки: блокировка могла истечь и достаться другому воркеру
+RELEASE_LOCKS_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call('get', key) == ARGV[1] then
+        redis.call('del', key)
+    end
+end
+"""
+
+# Удаляет ключи сущностей и все зависящие от них записи одним вызовом и оповещает
+# воркеры о сброшенных ключах (ARGV[1] - канал, пустая строка - не оповещать).
+# Время сброса сущности (мкс по часам Redis) хранится ARGV[2] секунд в `inv:<ключ>`, см. FILL_SCRIPT.
+# Префиксы `deps:` и `inv:` совпадают с `Cache.make_dependency_key` и `Cache.make_invalidation_key`;
+# скрипт рассчитан на один узел Redis
+INVALIDATE_SCRIPT = """
+local now = redis.call('time')
+local stamp = tonumber(now[1]) * 1000000 + tonumber(now[2])
+local stale = {}
+for _, key in ipairs(KEYS) do
+    redis.call('set', 'inv:' .. key, stamp, 'EX', ARGV[2])
+    table.insert(stale, key)
+    local dependency_key = 'deps:' .. key
+    for _, member in ipairs(redis.call('smembers', dependency_key)) do
+        table.insert(stale, member)
+    end
+    table.insert(stale, dependency_key)
+end
+for i = 1, #stale, 1000 do
+    redis.call('del', unpack(stale, i, math.min(i + 999, #stale)))
+end
+if ARGV[1] ~= '' then
+    redis.call('publish', ARGV[1], cjson.encode(stale))
+end
+return stale
+"""
+
+# Записывает значение, загруженное из базы, только если с начала загрузки (ARGV[3], мкс по часам
+# Redis) не сброшены ни ключ KEYS[1], ни сущности KEYS[2..], из которых значение собрано.
+# Иначе читатель, начавший загрузку до изменения, вернул бы в кэш старое значение на весь TTL.
+# Загрузка дольше ARGV[4] мкс (время хранения отметок сброса) не записывается вовсе.
+# ARGV[1] - значение, ARGV[2] - TTL; возвращает 1, если значение записано
+FILL_SCRIPT = """
+local now = redis.call('time')
+local since = tonumber(ARGV[3])
+if tonumber(now[1]) * 1000000 + tonumber(now[2]) - since > tonumber(ARGV[4]) then
+    return 0
+end
+for _, key in ipairs(KEYS) do
+    local stamp = redis.call('get', 'inv:' .. key)
+    if stamp and tonumber(stamp) >= since then
+        return 0
+    end
+end
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, #KEYS do
+    local dependency_key = 'deps:' .. KEYS[i]
+    redis.call('sadd', dependency_key, KEYS[1])
+    redis.call('expire', dependency_key, ARGV[2])
+end
+return 1
+"""
+
+# Как часто воркер без блокировки проверяет, не появилось ли значение в Redis
+LOCK_POLL_INTERVAL_SECONDS = 0.05
 
 
 # Класс отвечающий за запись и получение данных из кэша
 class Cache:
+    serializer = CacheSerializer(
+        codec=app_config.redis_db.CACHE_CODEC,
+        compress_min_size=app_config.redis_db.CACHE_COMPRESS_MIN_SIZE,
+    )
+
+    # Загрузки ключей, выполняющиеся в этом процессе (single-flight)
+    _inflight: Dict[str, 'asyncio.Future[Any]'] = {}
+
     def __init__(self, db):
         self.db = db
 
+    @staticmethod
+    def _to_plain(obj: Any) -> Any:
+        """Pydantic and ORM objects to plain dicts, codecs handle UUID and datetime themselves"""
+        if isinstance(obj, BaseModel):
+            return obj.dict()
+        if isinstance(obj, Base):
+            return {column.key: getattr(obj, column.key) for column in obj.__table__.c}
+        return obj
+
+    def _dumps_entry(self, obj: Any, delta: float = 0, expire: Optional[int] = None) -> bytes:
+        """Cache value: the object with its load time and expiration moment for early refresh"""
+        return self.serializer.dumps({
+            "data": obj,
+            "delta": delta,
+            "expires": time.time() + (expire or app_config.redis_db.CACHE_EXPIRE_IN_SECONDS),
+        })
+
+    def _loads_entry(self, data: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        entry = self.serializer.loads(data)
+        return entry if isinstance(entry, dict) and "data" in entry else None
+
+    def _parse(self, data: Optional[bytes], obj_model: Any) -> Optional[Any]:
+        entry = self._loads_entry(data)
+        if entry is None or entry["data"] is None:
+            return None
+        return obj_model.parse_obj(entry["data"])
+
+    @staticmethod
+    def _should_refresh(entry: Dict[str, Any]) -> bool:
+        """Probabilistic early expiration (XFetch): the closer the entry to expiration and the
+        longer it takes to load, the more likely a reader refreshes it before it expires"""
+        beta = app_config.redis_db.CACHE_EARLY_REFRESH_BETA
+        if beta <= 0 or not entry.get("delta"):
+            return False
+        return time.time() - entry["delta"] * beta * math.log(1 - random.random()) >= entry["expires"]
+
+    @staticmethod
+    def _get_local(obj_id: str, obj_model: Any) -> Optional[Any]:
+        """Object from the in-process cache (L1) if it is enabled"""
+        if local_cache is None:
+            return None
+        obj = local_cache.get(obj_id)
+        return obj if isinstance(obj, obj_model) else None
+
+    @staticmethod
+    def _put_local(obj_id: str, obj: Any) -> None:
+        if local_cache is not None and obj is not None:
+            local_cache.set(obj_id, obj)
+
     async def get_from_cache(self, obj_id: str, obj_model: ModelType):
         """[summary]
 
@@ -63,26 +246,348 @@ class Cache:
             obj_id (str): [description]
             obj_model (ModelType): [description]
         """
-        data = await self.db.get(obj_id)
-        if not data:
-            return None
+        obj = self._get_local(obj_id, obj_model)
+        if obj is None:
+            obj = self._parse(await self.db.get(obj_id), obj_model)
+            self._put_local(obj_id, obj)
+        return obj
 
-        return obj_model.parse_obj(pickle.loads(data))
+    @staticmethod
+    def make_key(table_name: str, obj_id: Any) -> str:
+        """Cache key of an object: `<table name>_<id>`"""
+        return f'{table_name.lower()}_{obj_id}'
 
-    async def put_to_cache(self, obj_model: ModelType):
+    async def put_to_cache(self, obj_model: ModelType, obj_key: Optional[str] = None):
         """[summary]
 
         Args:
             obj_model (ModelType): [description]
+            obj_key (Optional[str]): cache key, by default built from `__tablename__` and `id`
         """
-        await self.db.set(
-            f'{obj_model.__tablename__.lower()}_{obj_model.id}',
-            pickle.dumps(jsonable_encoder(obj_model)),
-        )
-        await self.db.expire(
-            name=f'{obj_model.__tablename__.lower()}_{obj_model.id}',
-            time=app_config.redis_db.CACHE_EXPIRE_IN_SECONDS
-        )
+        obj_key = obj_key or self.make_key(obj_model.__tablename__, obj_model.id)
+        await self.set_many({obj_key: obj_model})
+
+    async def get_many_from_cache(self, objs_ids: List[str], obj_model: Type[SchemaType]) -> List[Optional[SchemaType]]:
+        return await self.get_many(objs_ids, obj_model)
+
+    async def get_many(self, objs_ids: List[str], obj_model: Type[SchemaType]) -> List[Optional[SchemaType]]:
+        """Read many objects with a single MGET
+
+        Args:
+            objs_ids (List[str]): cache keys
+            obj_model (Type[SchemaType]): pydantic model of cached objects
+
+        Returns:
+            List[Optional[SchemaType]]: objects in the order of keys, `None` for misses
+        """
+        if not objs_ids:
+            return []
+
+        objs = [self._get_local(obj_id, obj_model) for obj_id in objs_ids]
+        missing = [index for index, obj in enumerate(objs) if obj is None]
+        if missing:
+            data = await self.db.mget([objs_ids[index] for index in missing])
+            for index, item in zip(missing, data):
+                objs[index] = self._parse(item, obj_model)
+                self._put_local(objs_ids[index], objs[index])
+        return objs
+
+    async def get_or_load_many(
+        self,
+        objs_ids: List[str],
+        obj_model: Type[SchemaType],
+        loader: Callable[[List[str]], Awaitable[Dict[str, SchemaType]]],
+        dependencies: Optional[Callable[[SchemaType], Iterable[str]]] = None,
+        expire: Optional[int] = None,
+    ) -> List[Optional[SchemaType]]:
+        """Read many objects, loading misses without a stampede: concurrent misses of the same
+        key are coalesced into one `loader` call inside the worker and across workers
+        (short Redis lock), hot entries are refreshed by a single reader before they expire
+
+        Args:
+            objs_ids (List[str]): cache keys
+            obj_model (Type[SchemaType]): pydantic model of cached objects
+            loader (Callable[[List[str]], Awaitable[Dict[str, SchemaType]]]): loads objects by
+                cache keys from the database, missing objects are omitted
+            dependencies (Optional[Callable[[SchemaType], Iterable[str]]]): entity keys of an object,
+                see `put_many_to_cache`
+            expire (Optional[int]): TTL of loaded objects, by default `CACHE_EXPIRE_IN_SECONDS`
+
+        Returns:
+            List[Optional[SchemaType]]: objects in the order of keys, `None` for not found
+        """
+        objs: Dict[str, SchemaType] = {}
+        early = []
+        remote = []
+        absent = set()
+        for obj_id in dict.fromkeys(objs_ids):
+            obj = self._get_local(obj_id, obj_model)
+            if obj is None:
+                remote.append(obj_id)
+            else:
+                objs[obj_id] = obj
+
+        if remote:
+            for obj_id, item in zip(remote, await self.db.mget(remote)):
+                entry = self._loads_entry(item)
+                if entry is None:
+                    continue
+                if entry["data"] is None:
+                    # Объект не найден при прошлой загрузке, запись сбросится при его создании
+                    absent.add(obj_id)
+                    continue
+                objs[obj_id] = obj_model.parse_obj(entry["data"])
+                if self._should_refresh(entry):
+                    early.append(obj_id)
+                else:
+                    self._put_local(obj_id, objs[obj_id])
+
+        missing = [obj_id for obj_id in remote if obj_id not in objs and obj_id not in absent]
+        if missing or early:
+            objs.update(await self._load_coalesced(missing, early, obj_model, loader, dependencies, expire))
+
+        return [objs.get(obj_id) for obj_id in objs_ids]
+
+    async def _load_coalesced(
+        self,
+        missing: List[str],
+        early: List[str],
+        obj_model: Type[SchemaType],
+        loader: Callable[[List[str]], Awaitable[Dict[str, SchemaType]]],
+        dependencies: Optional[Callable[[SchemaType], Iterable[str]]],
+        expire: Optional[int],
+    ) -> Dict[str, SchemaType]:
+        """In-process single-flight: one coroutine per key loads it, the others wait for its result"""
+        waiting = {obj_id: self._inflight[obj_id] for obj_id in missing if obj_id in self._inflight}
+        # Раннее обновление необязательно: если ключ уже загружается, используется текущее значение
+        own_missing = [obj_id for obj_id in missing if obj_id not in waiting]
+        own_early = [obj_id for obj_id in early if obj_id not in self._inflight]
+
+        loop = asyncio.get_event_loop()
+        futures = {obj_id: loop.create_future() for obj_id in own_missing + own_early}
+        self._inflight.update(futures)
+        try:
+            loaded = await self._load_locked(own_missing, own_early, obj_model, loader, dependencies, expire)
+        except Exception as error:
+            for future in futures.values():
+                future.set_exception(error)
+                # Ожидающих может не быть, исключение считается обработанным
+                future.exception()
+            raise
+        else:
+            for obj_id, future in futures.items():
+                future.set_result(loaded.get(obj_id))
+        finally:
+            for obj_id in futures:
+                self._inflight.pop(obj_id, None)
+
+        for obj_id, future in waiting.items():
+            obj = await future
+            if obj is not None:
+                loaded[obj_id] = obj
+        return loaded
+
+    async def _load_locked(
+        self,
+        missing: List[str],
+        early: List[str],
+        obj_model: Type[SchemaType],
+        loader: Callable[[List[str]], Awaitable[Dict[str, SchemaType]]],
+        dependencies: Optional[Callable[[SchemaType], Iterable[str]]],
+        expire: Optional[int],
+    ) -> Dict[str, SchemaType]:
+        """Cross-worker single-flight: keys are loaded by the worker holding their Redis lock,
+        the others wait for the value to appear in Redis and load it themselves on timeout"""
+        if not missing and not early:
+            return {}
+
+        token, locked, since = await self._acquire_locks(missing + early)
+        try:
+            loaded = await self._wait_for_values([obj_id for obj_id in missing if obj_id not in locked], obj_model)
+            to_load = [obj_id for obj_id in missing + early if obj_id in locked]
+            to_load += [obj_id for obj_id in missing if obj_id not in locked and obj_id not in loaded]
+            if to_load:
+                started = time.monotonic()
+                objs = await loader(to_load)
+                delta = time.monotonic() - started
+                async with self.batch() as batch:
+                    for obj_id, obj in objs.items():
+                        batch.set(
+                            obj_id,
+                            obj,
+                            dependencies=dependencies(obj) if dependencies else (),
+                            delta=delta,
+                            expire=expire,
+                            since=since,
+                        )
+                    for obj_id in to_load:
+                        if obj_id not in objs:
+                            batch.set_missing(obj_id, since=since)
+                loaded.update(objs)
+        finally:
+            await self._release_locks(locked, token)
+
+        return {obj_id: obj for obj_id, obj in loaded.items() if obj is not None}
+
+    @staticmethod
+    def make_lock_key(obj_id: str) -> str:
+        return f'lock:{obj_id}'
+
+    async def _acquire_locks(self, objs_ids: List[str]) -> Tuple[str, List[str], int]:
+        """Locks of the keys and the Redis time before the load, see `Cache.now`"""
+        token = uuid.uuid4().hex
+        async with self.db.pipeline(transaction=False) as pipe:
+            pipe.time()
+            for obj_id in objs_ids:
+                pipe.set(
+                    self.make_lock_key(obj_id),
+                    token,
+                    nx=True,
+                    px=int(app_config.redis_db.CACHE_LOCK_TIMEOUT_SECONDS * 1000),
+                )
+            server_time, *acquired = await pipe.execute()
+        return token, [obj_id for obj_id, is_set in zip(objs_ids, acquired) if is_set], self._microseconds(server_time)
+
+    async def _release_locks(self, objs_ids: List[str], token: str) -> None:
+        if objs_ids:
+            lock_keys = [self.make_lock_key(obj_id) for obj_id in objs_ids]
+            await self.db.eval(RELEASE_LOCKS_SCRIPT, len(lock_keys), *lock_keys, token)
+
+    async def _wait_for_values(
+        self, objs_ids: List[str], obj_model: Type[SchemaType]
+    ) -> Dict[str, Optional[SchemaType]]:
+        """Poll Redis for values loaded by the lock holders, `None` for objects they haven't found"""
+        found: Dict[str, Optional[SchemaType]] = {}
+        deadline = time.monotonic() + app_config.redis_db.CACHE_LOCK_WAIT_SECONDS
+        while objs_ids and time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL_SECONDS)
+            for obj_id, item in zip(objs_ids, await self.db.mget(objs_ids)):
+                entry = self._loads_entry(item)
+                if entry is None:
+                    continue
+                found[obj_id] = obj_model.parse_obj(entry["data"]) if entry["data"] is not None else None
+                self._put_local(obj_id, found[obj_id])
+            objs_ids = [obj_id for obj_id in objs_ids if obj_id not in found]
+        return found
+
+    @staticmethod
+    def _microseconds(server_time: Tuple[int, int]) -> int:
+        seconds, microseconds = server_time
+        return seconds * 1000000 + microseconds
+
+    async def now(self) -> int:
+        """Redis time in microseconds: taken before a load from the database and passed as `since`
+        to `CacheBatch.set`, so the value is not written if its entities changed during the load"""
+        return self._microseconds(await self.db.time())
+
+    @staticmethod
+    def make_invalidation_key(entity_key: str) -> str:
+        """Time of the last invalidation of an entity: `inv:<entity key>`, see `FILL_SCRIPT`"""
+        return f'inv:{entity_key}'
+
+    @staticmethod
+    def make_raw_key(obj_key: str) -> str:
+        """Key of ready response bytes of an object, the format version is a part of the key"""
+        return f'{obj_key}:raw:{CACHE_SCHEMA_VERSION}'
+
+    @staticmethod
+    def make_pending_key(obj_key: str) -> str:
+        """Key of an object accepted for an asynchronous write, but not written to the database yet"""
+        return f'pending:{obj_key}'
+
+    async def get_raw(self, obj_key: str) -> Optional[bytes]:
+        """Ready response bytes written by `CacheBatch.set_raw`, without any decoding
+
+        Args:
+            obj_key (str): key from `make_raw_key`
+
+        Returns:
+            Optional[bytes]: stored bytes
+        """
+        raw = self._get_local(obj_key, bytes)
+        if raw is None:
+            raw = await self.db.get(obj_key)
+            self._put_local(obj_key, raw)
+        return raw
+
+    @staticmethod
+    def make_generation_key(collection: str) -> str:
+        """Counter of changes of a collection: `gen:<table name>`"""
+        return f'gen:{collection}'
+
+    @staticmethod
+    def make_list_key(collection: str, generation: int, params: Dict[str, Any]) -> str:
+        """Key of a cached list page: `list:<table name>:<generation>:<parameters hash>`.
+        A change of the collection bumps the generation, so all its pages become stale at once"""
+        digest = hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()   # pylint: disable=no-member
+        return f'list:{collection}:{generation}:{digest}'
+
+    async def get_generation(self, collection: str) -> int:
+        """Current generation of a collection, see `make_list_key`"""
+        generation = await self.db.get(self.make_generation_key(collection))
+        return int(generation) if generation else 0
+
+    @staticmethod
+    def make_dependency_key(entity_key: str) -> str:
+        """Key of the set with cache keys depending on an entity: `deps:<entity key>`"""
+        return f'deps:{entity_key}'
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator['CacheBatch']:
+        """Buffer cache writes of a request and send them in one round trip on exit
+
+        Example:
+            async with cache.batch() as batch:
+                batch.set(key, obj)
+                batch.invalidate([entity_key])
+        """
+        batch = CacheBatch(self)
+        yield batch
+        await batch.execute()
+
+    async def put_many_to_cache(
+        self, objs: Dict[str, SchemaType], dependencies: Optional[Dict[str, Iterable[str]]] = None
+    ):
+        await self.set_many(objs, dependencies=dependencies)
+
+    async def set_many(
+        self,
+        objs: Dict[str, SchemaType],
+        dependencies: Optional[Dict[str, Iterable[str]]] = None,
+        delta: float = 0,
+        expire: Optional[int] = None,
+    ):
+        """Write many objects with TTL in one pipeline round trip
+
+        Args:
+            objs (Dict[str, SchemaType]): objects by cache key
+            dependencies (Optional[Dict[str, Iterable[str]]]): entity keys (`make_key`) each cached
+                object is built from, a write to any of them invalidates the object
+            delta (float): time spent to load the objects, enables their early refresh
+            expire (Optional[int]): TTL in seconds, by default `CACHE_EXPIRE_IN_SECONDS`
+        """
+        dependencies = dependencies or {}
+        async with self.batch() as batch:
+            for obj_key, obj in objs.items():
+                batch.set(obj_key, obj, dependencies=dependencies.get(obj_key, ()), delta=delta, expire=expire)
+
+    async def delete_many(self, objs_ids: Iterable[str]):
+        """Delete many keys with a single DEL
+
+        Args:
+            objs_ids (Iterable[str]): cache keys
+        """
+        async with self.batch() as batch:
+            batch.delete(objs_ids)
+
+    async def invalidate(self, entity_keys: Iterable[str]):
+        """Delete cached objects depending on the entities and the entities own keys
+
+        Args:
+            entity_keys (Iterable[str]): keys of the changed entities (`make_key`)
+        """
+        async with self.batch() as batch:
+            batch.invalidate(entity_keys)
 
     async def get_list_from_cache(self, objs_cache_id: str, obj_model: ModelType) -> Optional[List[ModelType]]:
         """[summary]
@@ -94,15 +599,11 @@ class Cache:
         Returns:
             Optional[List[ModelType]]: [description]
         """   
-        objs = await self.db.get(objs_cache_id)
-        if not objs:
+        entry = self._loads_entry(await self.db.get(objs_cache_id))
+        if entry is None:
             return None
 
-        objs = json.loads(objs)
-        new_objs = []
-        for obj in objs:
-            new_objs.append(obj_model.parse_raw(json.dumps(obj)))
-        return new_objs     
+        return [obj_model.parse_obj(obj) for obj in entry["data"]]
 
     async def put_list_to_cache(self, objs_cache_id: str, objs: List[Dict[str, Any]]):
         """[summary]
@@ -113,13 +614,9 @@ class Cache:
         """   
         await self.db.set(
             objs_cache_id,
-            json.dumps(objs),
-        )    
-
-        await self.db.expire(
-            name=objs_cache_id,
-            time=app_config.redis_db.CACHE_EXPIRE_IN_SECONDS,
-        ) 
+            self._dumps_entry([self._to_plain(obj) for obj in objs]),
+            ex=app_config.redis_db.CACHE_EXPIRE_IN_SECONDS,
+        )
 
     async def delete_from_cache(self, obj_id: str):
         """[summary]
@@ -127,4 +624,136 @@ class Cache:
         Args:
             obj_id (str): [description]
         """        
-        await self.db.delete(obj_id)
+        await self.delete_many([obj_id])
+
+
+class CacheBatch:
+    """
+        Cache writes buffered into one Redis pipeline, see `Cache.batch`.
+        The in-process cache (L1) of this worker is updated after the pipeline is executed,
+        the other workers are notified through the invalidation channel in the same round trip.
+    """
+
+    def __init__(self, cache: Cache):
+        self.cache = cache
+        self._pipe = cache.db.pipeline(transaction=False)
+        self._size = 0
+        self._local: Dict[str, Any] = {}
+        self._deleted: List[str] = []
+        self._invalidations: List[int] = []
+        # Условные записи: индекс результата в конвейере и ключ
+        self._fills: Dict[int, str] = {}
+
+    def set(
+        self,
+        obj_key: str,
+        obj: Any,
+        *,
+        dependencies: Iterable[str] = (),
+        delta: float = 0,
+        expire: Optional[int] = None,
+        since: Optional[int] = None,
+    ) -> None:
+        """Atomic SET with TTL, the object is registered in the dependency sets of its entities.
+        With `since` (`Cache.now` before the load) the object is written only if neither the key
+        nor its dependencies were invalidated after that moment"""
+        expire = expire or app_config.redis_db.CACHE_EXPIRE_IN_SECONDS
+        self._set(obj_key, self.cache._dumps_entry(self.cache._to_plain(obj), delta, expire), dependencies, expire, since)
+        self._local[obj_key] = obj
+
+    def set_raw(
+        self,
+        obj_key: str,
+        raw: bytes,
+        *,
+        dependencies: Iterable[str] = (),
+        expire: Optional[int] = None,
+        since: Optional[int] = None,
+    ) -> None:
+        """Store bytes as is, they are invalidated and guarded by the same dependencies as objects"""
+        expire = expire or app_config.redis_db.CACHE_EXPIRE_IN_SECONDS
+        self._set(obj_key, raw, dependencies, expire, since)
+        self._local[obj_key] = raw
+
+    def set_missing(self, obj_key: str, since: Optional[int] = None) -> None:
+        """Short-lived "not found" entry: the key is deleted by invalidation when the entity is created"""
+        expire = app_config.redis_db.CACHE_NEGATIVE_EXPIRE_IN_SECONDS
+        self._set(obj_key, self.cache._dumps_entry(None, expire=expire), (), expire, since)
+
+    def _set(self, obj_key: str, value: bytes, dependencies: Iterable[str], expire: int, since: Optional[int]) -> None:
+        if since is not None:
+            dependencies = list(dependencies)
+            self._fills[self._size] = obj_key
+            self._pipe.eval(
+                FILL_SCRIPT,
+                1 + len(dependencies),
+                obj_key,
+                *dependencies,
+                value,
+                expire,
+                since,
+                int(app_config.redis_db.CACHE_FILL_GUARD_SECONDS * 1000000),
+            )
+            self._size += 1
+            return
+
+        self._pipe.set(obj_key, value, ex=expire)
+        self._size += 1
+        for entity_key in dependencies:
+            dependency_key = self.cache.make_dependency_key(entity_key)
+            self._pipe.sadd(dependency_key, obj_key)
+            self._pipe.expire(dependency_key, expire)
+            self._size += 2
+
+    def delete(self, objs_ids: Iterable[str]) -> None:
+        objs_ids = list(objs_ids)
+        if not objs_ids:
+            return
+
+        self._pipe.delete(*objs_ids)
+        self._size += 1
+        if local_cache is not None:
+            self._pipe.publish(INVALIDATION_CHANNEL, orjson.dumps(objs_ids))     # pylint: disable=no-member
+            self._size += 1
+        self._deleted.extend(objs_ids)
+
+    def bump_generation(self, collection: str) -> None:
+        """Make all cached list pages of the collection stale"""
+        # Счетчик без TTL: при вытеснении он начнется с нуля, поэтому Redis должен вытеснять
+        # только ключи с TTL (`maxmemory-policy volatile-*`)
+        self._pipe.incr(self.cache.make_generation_key(collection))
+        self._size += 1
+
+    def invalidate(self, entity_keys: Iterable[str]) -> None:
+        entity_keys = list(dict.fromkeys(entity_keys))
+        if not entity_keys:
+            return
+
+        self._invalidations.append(self._size)
+        self._pipe.eval(
+            INVALIDATE_SCRIPT,
+            len(entity_keys),
+            *entity_keys,
+            INVALIDATION_CHANNEL if local_cache is not None else '',
+            math.ceil(app_config.redis_db.CACHE_FILL_GUARD_SECONDS),
+        )
+        self._size += 1
+
+    async def execute(self) -> None:
+        if not self._size:
+            return
+
+        results = await self._pipe.execute()
+        self._size = 0
+        if local_cache is None:
+            return
+
+        stale = list(self._deleted)
+        for index in self._invalidations:
+            stale.extend(key.decode() if isinstance(key, bytes) else key for key in results[index])
+        # Отклоненная условная запись не попадает и в кэш процесса
+        rejected = {obj_key for index, obj_key in self._fills.items() if not results[index]}
+        for obj_key, obj in self._local.items():
+            if obj_key not in rejected:
+                local_cache.set(obj_key, obj)
+        local_cache.delete(stale)
@@ -0,0 +1,85 @@
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SEQUENCE, SHAPE_SINGLETON, ModelField
+
+
+Extractor = Callable[[Any], Any]
+
+
+class Serializer:
+    """
+        Converts ORM objects, database rows and pydantic models into orjson-ready dicts
+        of a response schema without validation. Field extractors are built once per schema,
+        values that orjson encodes natively (UUID, datetime, Enum) are left as is.
+        Routes keep `response_model` for the OpenAPI docs and return `response()`,
+        so FastAPI neither converts `orm_mode` objects nor validates them again.
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.schema = schema
+        self._fields: List[Tuple[str, str, Any, Optional[Extractor]]] = [
+            (field.alias, field.name, field.get_default(), self._compile_nested(field))
+            for field in schema.__fields__.values()
+        ]
+
+    @staticmethod
+    def _compile_nested(field: ModelField) -> Optional[Extractor]:
+        if not (isinstance(field.type_, type) and issubclass(field.type_, BaseModel)):
+            return None
+
+        nested = Serializer(field.type_)
+        if field.shape == SHAPE_SINGLETON:
+            return lambda value: nested.dump(value) if value is not None else None
+        if field.shape in (SHAPE_LIST, SHAPE_SEQUENCE):
+            return lambda value: nested.dump_many(value) if value is not None else None
+        raise TypeError(f"Field {field.name} of {field.type_.__name__} shape is not supported")
+
+    def dump(self, obj: Any) -> Dict[str, Any]:
+        """Response dict of one object
+
+        Args:
+            obj (Any): ORM object, pydantic model, dict or database row
+
+        Returns:
+            Dict[str, Any]: values by field aliases
+        """
+        if hasattr(obj, 'keys'):
+            # dict, строка SQLAlchemy или `databases`: поле ищется по имени, затем по алиасу
+            keys = set(obj.keys())
+            items = (
+                (alias, obj[name] if name in keys else obj[alias] if alias in keys else default, nested)
+                for alias, name, default, nested in self._fields
+            )
+        else:
+            items = ((alias, getattr(obj, name, default), nested)
+                     for alias, name, default, nested in self._fields)
+
+        return {alias: nested(value) if nested else value for alias, value, nested in items}
+
+    def dump_many(self, objs: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [self.dump(obj) for obj in objs]
+
+    def response(
+        self,
+        objs: Any,
+        *,
+        many: bool = False,
+        status_code: int = HTTPStatus.OK,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> ORJSONResponse:
+        """Ready response, FastAPI returns it without `response_model` processing
+
+        Args:
+            objs (Any): object or iterable of objects when `many`
+            many (bool): serialize a list
+            status_code (int): response status
+            headers (Optional[Dict[str, str]]): response headers
+
+        Returns:
+            ORJSONResponse: encoded response
+        """
+        content = self.dump_many(objs) if many else self.dump(objs)
+        return ORJSONResponse(content=content, status_code=status_code, headers=headers)
@@ -7,13 +7,17 @@ from sqlalchemy.orm import sessionmaker, scoped_session
 from fastapi import Request
 
 from src.core.config.app_settings import AppSettings
+from src.models.history_meta import versioned_session
 
 
 app_config = AppSettings()
 database: Optional[Database] = None
 
 engine = create_engine(app_config.db.pg_dsn)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Значения всех колонок задаются на стороне Python, поэтому после commit их не нужно перечитывать
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+# История изменений версионируемых моделей пишется одним обработчиком на фабрику сессий
+versioned_session(SessionLocal)
 db_session = scoped_session(SessionLocal)
 
 Base = declarative_base()
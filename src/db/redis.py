@@ -1,8 +1,14 @@
+import asyncio
+from typing import Optional
+
 import aioredis
 
 
 redis: aioredis.Redis = None            # type: ignore
 pool: aioredis.ConnectionPool = None    # type: ignore
+invalidation_listener: asyncio.Task = None      # type: ignore
+events_listener: asyncio.Task = None            # type: ignore
+comment_consumer: Optional[asyncio.Task] = None
 
 
 # Функция понадобится при внедрении зависимостей
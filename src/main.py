@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import aioredis
 import databases
@@ -8,9 +9,12 @@ from fastapi import FastAPI, Request, Response
 from fastapi.responses import ORJSONResponse
 
 from src.core import logger
+from src.core.events import broker
+from src.core.local_cache import listen_invalidations
 from src.core.config.app_settings import AppSettings
 from src.db import redis, postgresql
-from src.api.v1 import ticket, comment
+from src.api.v1 import ticket, comment, cache
+from src.services.comment_queue import consume_comments
 
 # Применяем настройки логирования
 logging_config.dictConfig(logger.LOGGING)
@@ -35,6 +39,11 @@ app = FastAPI(
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
     response = Response("Internal server error", status_code=500)
+    if app_config.db.async_crud:
+        # Запросы выполняются через общий пул соединений `databases`, сессия не нужна
+        request.state.db = postgresql.database
+        return await call_next(request)
+
     try:
         request.state.db = postgresql.SessionLocal()
         response = await call_next(request)
@@ -50,16 +59,30 @@ async def startup():
     # Поэтому логика подключения происходит в асинхронной функции
     redis.pool = aioredis.ConnectionPool.from_url(
         app_config.redis_db.cache_dsn,
-        decode_responses=True,
+        # В кэше хранятся бинарные значения с заголовком (src/core/codecs.py)
+        decode_responses=False,
     )
 
     redis.redis = aioredis.Redis(connection_pool=redis.pool)
-    postgresql.database = await databases.Database(app_config.db.pg_dsn).connect()
+    # Сброс кэша воркера по сообщениям остальных воркеров
+    redis.invalidation_listener = asyncio.create_task(listen_invalidations(redis.redis))
+    # Одна подписка воркера на изменения тикетов для всех клиентов SSE
+    redis.events_listener = asyncio.create_task(broker.listen(redis.redis))
+    postgresql.database = databases.Database(app_config.db.pg_dsn)
+    await postgresql.database.connect()
+    if app_config.comment_queue_enabled:
+        # Запись комментариев из очереди, каждый воркер - потребитель общей группы
+        redis.comment_consumer = asyncio.create_task(consume_comments(redis.redis, postgresql.database))
 
 
 @app.on_event('shutdown')
 async def shutdown():
     # Отключаемся от баз при выключении сервера
+    redis.invalidation_listener.cancel()
+    redis.events_listener.cancel()
+    broker.close_all()
+    if redis.comment_consumer:
+        redis.comment_consumer.cancel()
     await redis.pool.disconnect()
     await postgresql.database.disconnect()
 
@@ -68,6 +91,7 @@ async def shutdown():
 # Теги указываем для удобства навигации по документации
 app.include_router(ticket.router, prefix='/v1/ticket', tags=['ticket'])
 app.include_router(comment.router, prefix='/v1/comment', tags=['comment'])
+app.include_router(cache.router, prefix='/v1/cache', tags=['cache'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+import aioredis
+
+from logging import config as logging_config
+
+from src.core import logger
+from src.core.config.app_settings import AppSettings
+from src.db import postgresql
+from src.models import tickets as ticket_model
+from src.core.modules import Cache
+from src.services import bulk_import, history_partitions
+from src.services.crud.ticket import TicketService
+
+# Применяем настройки логирования
+logging_config.dictConfig(logger.LOGGING)
+log = logging.getLogger(__name__)
+
+# Настройки приложения
+app_config = AppSettings()
+
+
+# Команды обслуживания запускаются из корня проекта:
+# `python -m src.manage <command>`
+async def reconcile_stats(args: argparse.Namespace):
+    """Repair ticket counters drift, suitable for cron"""
+    db = postgresql.SessionLocal()
+    try:
+        drift = await TicketService(ticket_model.Ticket).reconcile_stats(db)
+    finally:
+        db.close()
+
+    if drift:
+        log.warning("Ticket counters repaired, drift by status: %s", drift)
+    else:
+        log.info("Ticket counters are consistent")
+
+
+async def maintain_history_partitions(args: argparse.Namespace):
+    """Pre-create future `tickets_history` partitions and archive old ones, suitable for cron"""
+    db = postgresql.SessionLocal()
+    try:
+        created = history_partitions.create_partitions(db, args.ahead)
+        log.info("History partitions created: %s", created or "none")
+
+        if args.retention_months is not None:
+            archived = history_partitions.archive_partitions(db, args.retention_months, args.export_dir)
+            log.info("History partitions archived: %s", archived or "none")
+    finally:
+        db.close()
+
+
+async def import_data(args: argparse.Namespace):
+    """Bulk load tickets, comments or history from a NDJSON or CSV file"""
+    redis = None
+    cache = None
+    if not args.skip_cache:
+        redis = aioredis.from_url(app_config.redis_db.cache_dsn, decode_responses=False)
+        cache = Cache(db=redis)
+
+    if args.defer_counters:
+        bulk_import.set_counter_triggers(enabled=False)
+    try:
+        _, _, failed = await bulk_import.import_file(
+            args.entity,
+            args.path,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint,
+            rejects_path=args.rejects,
+            cache=cache,
+            defer_cache=args.defer_cache,
+        )
+    finally:
+        if args.defer_counters:
+            bulk_import.set_counter_triggers(enabled=True)
+            await reconcile_stats(args)
+        if redis is not None:
+            await redis.close()
+
+    if failed:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ticketing service maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "reconcile-stats", help="recount tickets by status and repair the counters table",
+    ).set_defaults(handler=reconcile_stats)
+
+    history = commands.add_parser(
+        "history-partitions", help="create future tickets_history partitions and archive old ones",
+    )
+    history.add_argument(
+        "--ahead", type=int, default=app_config.db.history_partitions_ahead,
+        help="number of months to create partitions for in advance",
+    )
+    history.add_argument(
+        "--retention-months", type=int, default=app_config.db.history_retention_months,
+        help="detach partitions older than this number of months, by default keep all",
+    )
+    history.add_argument(
+        "--export-dir", default=None,
+        help="export old and previously detached partitions to CSV files in this directory and drop them",
+    )
+    history.set_defaults(handler=maintain_history_partitions)
+
+    importer = commands.add_parser(
+        "import", help="bulk load tickets, comments or history from a NDJSON or CSV file with COPY",
+    )
+    importer.add_argument("entity", choices=sorted(bulk_import.ENTITIES), help="what the file contains")
+    importer.add_argument("path", help="NDJSON file, or CSV with a header if the name ends with .csv")
+    importer.add_argument("--chunk-size", type=int, default=10000, help="rows per COPY transaction")
+    importer.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel worker processes")
+    importer.add_argument(
+        "--checkpoint", default=None,
+        help="file with loaded chunks to resume the import, by default <path>.checkpoint",
+    )
+    importer.add_argument(
+        "--rejects", default=None,
+        help="NDJSON file to append rejected records with their errors, by default <path>.rejects",
+    )
+    importer.add_argument(
+        "--defer-counters", action="store_true",
+        help="disable ticket counters triggers during the load and recount them after",
+    )
+    importer.add_argument(
+        "--defer-cache", action="store_true",
+        help="invalidate the cache once after the load instead of after every chunk",
+    )
+    importer.add_argument("--skip-cache", action="store_true", help="don't touch the cache at all")
+    importer.set_defaults(handler=import_data)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,28 @@ import uuid
 from datetime import datetime
 
 from sqlalchemy import Column, DateTime, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.types import TypeDecorator
+
+
+class UUID(TypeDecorator):
+    """
+        PostgreSQL `uuid` read as `uuid.UUID` by both drivers: psycopg2 returns strings,
+        asyncpg (`databases`) returns its own `UUID` subclass, which `UUID(as_uuid=True)`
+        can't parse and orjson can't serialize.
+    """
+    impl = postgresql.UUID
+
+    def __init__(self):
+        super().__init__(as_uuid=True)
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None or type(value) is uuid.UUID:      # pylint: disable=unidiomatic-typecheck
+                return value
+            return uuid.UUID(str(value))
+        return process
 
 
 class BaseMixin:
@@ -17,7 +37,7 @@ class BaseMixin:
     def __tablename__(cls):     # pylint: disable=no-self-argument
         return f"{cls.__name__.lower()}s"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    id = Column(UUID(), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
 
 
 class TimestampMixin:
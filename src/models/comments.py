@@ -1,12 +1,12 @@
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy import (
     Column,
     String,
+    Index,
 )
 from sqlalchemy.sql.schema import ForeignKey
 
 from src.db.postgresql import Base
-from src.models.base_mixins import TimestampMixin, AuditMixin, BaseMixin
+from src.models.base_mixins import TimestampMixin, AuditMixin, BaseMixin, UUID
 
 
 class CommentMixin(TimestampMixin, AuditMixin):
@@ -20,7 +20,13 @@ class Comment(Base, BaseMixin, CommentMixin):
 
     links: one-to-many with Ticket model
     """    
-    ticket_id = Column(UUID(as_uuid=True), ForeignKey("tickets.id"), onupdate="CASCADE")
+
+    __table_args__ = (
+        # комментарии тикета по порядку: keyset-пагинация и последние N комментариев
+        Index('ix_comments_ticket_id_created_at_id', 'ticket_id', 'created_at', 'id'),
+    )
+
+    ticket_id = Column(UUID(), ForeignKey("tickets.id"), onupdate="CASCADE")
 
     def __repr__(self) -> str:
         return f"<Comment {self.id}>"
@@ -109,12 +109,18 @@ def _history_mapper(local_mapper):
 
         # "changed" column stores the UTC timestamp of when the
         # history row was created.
-        # This column is optional and can be omitted.
+        # The history table is partitioned by month on this column,
+        # so it's required and, as PostgreSQL requires for the partition
+        # key, a part of the primary key.  (id, version) is no longer
+        # enforced by the database, it's unique by construction: every
+        # version is written once, by the flush that increments it.
         cols.append(
             Column(
                 "changed",
                 DateTime,
                 default=datetime.datetime.utcnow,
+                primary_key=True,
+                nullable=False,
                 info=version_meta,
             )
         )
@@ -190,17 +196,16 @@ def versioned_objects(iter_):
             yield obj
 
 
-def create_version(obj, session, deleted=False):
-    obj_mapper = object_mapper(obj)
-    history_mapper = obj.__history_mapper__
-    history_cls = history_mapper.class_
+_version_props_cache = {}
 
-    obj_state = attributes.instance_state(obj)
-
-    attr = {}
 
-    obj_changed = False
+def _version_props(obj_mapper, history_mapper):
+    """(history column key, mapped property) pairs to copy into the history row.
+    Computed once per mapper instead of on every flush."""
+    if obj_mapper in _version_props_cache:
+        return _version_props_cache[obj_mapper]
 
+    props = []
     for om, hm in zip(
         obj_mapper.iterate_to_root(), history_mapper.iterate_to_root()
     ):
@@ -226,32 +231,49 @@ def create_version(obj, session, deleted=False):
                 # base class is a feature of the declarative module.
                 continue
 
-            # expired object attributes and also deferred cols might not
-            # be in the dict.  force it to load no matter what by
-            # using getattr().
-            if prop.key not in obj_state.dict:
-                getattr(obj, prop.key)
+            props.append((hist_col.key, prop))
 
-            a, u, d = attributes.get_history(obj, prop.key)
+    _version_props_cache[obj_mapper] = props
+    return props
 
-            if d:
-                attr[prop.key] = d[0]
-                obj_changed = True
-            elif u:
-                attr[prop.key] = u[0]
-            elif a:
-                # if the attribute had no value.
-                attr[prop.key] = a[0]
+
+def _state_history(obj, key):
+    """History of an attribute from the state only, never loads it"""
+    return attributes.get_history(obj, key, passive=attributes.PASSIVE_NO_INITIALIZE)
+
+
+def create_version(obj, session, deleted=False, pending=None):
+    """Make a history row with the previous state of `obj`.
+
+    If `pending` dict is given, the row values are collected into
+    `pending[history_table]` to be inserted by `versioned_session`
+    in one multi-row INSERT, otherwise a history object is added to the session.
+    """
+    obj_mapper = object_mapper(obj)
+    history_mapper = obj.__history_mapper__
+    history_cls = history_mapper.class_
+
+    obj_state = attributes.instance_state(obj)
+    props = _version_props(obj_mapper, history_mapper)
+
+    # changed attributes are always in the state dict (with active_history
+    # the old value is loaded when the attribute is set), so the check
+    # doesn't need the values of expired or deferred attributes.
+    obj_changed = False
+    for _, prop in props:
+        if prop.key in obj_state.dict:
+            a, u, d = _state_history(obj, prop.key)
+            # a new value replaced an old one, or the attribute had no value
+            if d or (a and not u):
                 obj_changed = True
+                break
 
     if not obj_changed:
         # not changed, but we have relationships.  OK
         # check those too
         for prop in obj_mapper.iterate_properties:
             if (
-                isinstance(prop, RelationshipProperty) and attributes.get_history(
-                    obj, prop.key, passive=attributes.PASSIVE_NO_INITIALIZE
-                ).has_changes()
+                isinstance(prop, RelationshipProperty) and _state_history(obj, prop.key).has_changes()
             ):
                 for p in prop.local_columns:
                     if p.foreign_keys:
@@ -263,18 +285,55 @@ def create_version(obj, session, deleted=False):
     if not obj_changed and not deleted:
         return
 
-    attr["version"] = obj.version
-    hist = history_cls()
-    for key, value in attr.items():
-        setattr(hist, key, value)
-    session.add(hist)
+    # values that are already known are taken from the state, expired
+    # and deferred ones are loaded by a single SELECT
+    missing = [prop.key for _, prop in props if prop.key not in obj_state.dict]
+    if missing:
+        session.refresh(obj, attribute_names=missing)
+
+    attr = {}
+    columns = {}
+
+    for col_key, prop in props:
+        a, u, d = _state_history(obj, prop.key)
+
+        if d:
+            value = d[0]
+        elif u:
+            value = u[0]
+        elif a:
+            # if the attribute had no value.
+            value = a[0]
+        else:
+            continue
+
+        attr[prop.key] = value
+        columns[col_key] = value
+
+    if pending is not None and not history_mapper.inherits:
+        columns["version"] = obj.version
+        columns["changed"] = datetime.datetime.utcnow()
+        pending.setdefault(history_mapper.local_table, []).append(columns)
+    else:
+        attr["version"] = obj.version
+        hist = history_cls()
+        for key, value in attr.items():
+            setattr(hist, key, value)
+        session.add(hist)
     obj.version += 1
 
 
 def versioned_session(session):
+    """Register history writing on a session or a session factory (`sessionmaker`)"""
     @event.listens_for(session, "before_flush")
     def before_flush(session, flush_context, instances):
+        pending = {}
         for obj in versioned_objects(session.dirty):
-            create_version(obj, session)
+            create_version(obj, session, pending=pending)
         for obj in versioned_objects(session.deleted):
-            create_version(obj, session, deleted=True)
+            create_version(obj, session, deleted=True, pending=pending)
+
+        # one multi-row INSERT per history table for the whole flush
+        for table, rows in pending.items():
+            keys = set().union(*rows)
+            session.execute(table.insert().values([{key: row.get(key) for key in keys} for row in rows]))
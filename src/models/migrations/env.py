@@ -4,6 +4,7 @@ from src.core.config.database_settings import DBSettings
 from src.core.logger import LOGGING
 from src.db.postgresql import Base
 from src.models import tickets, comments        # noqa: F401
+from src.models.tickets import UNMAPPED_INDEXES
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -29,6 +30,14 @@ dictConfig(LOGGING)
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
 
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """Skip expression indexes declared in migrations only, otherwise autogenerate drops them"""
+    if type_ == "index" and reflected and name in UNMAPPED_INDEXES:
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,6 +62,7 @@ def run_migrations_offline():
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():       # pylint: disable=no-member
@@ -74,7 +84,8 @@ def run_migrations_online():
 
     with connectable.connect() as connection:
         context.configure(                  # pylint: disable=no-member
-            connection=connection, target_metadata=target_metadata          # pylint: disable=no-member
+            connection=connection, target_metadata=target_metadata,         # pylint: disable=no-member
+            include_object=include_object,
         )
 
         with context.begin_transaction():       # pylint: disable=no-member
@@ -0,0 +1,28 @@
+"""tickets keyset index
+
+Revision ID: 3f1c9a7d2b64
+Revises: 145247cdd748
+Create Date: 2026-10-18 10:12:31.418207
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2b64'
+down_revision = '145247cdd748'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс строится без блокировки записи в таблицу, поэтому вне транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tickets_created_at_id', 'tickets', ['created_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tickets_created_at_id', table_name='tickets', postgresql_concurrently=True)
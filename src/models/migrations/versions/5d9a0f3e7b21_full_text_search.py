@@ -0,0 +1,45 @@
+"""full text search
+
+Revision ID: 5d9a0f3e7b21
+Revises: c27b5e9f1a3d
+Create Date: 2026-10-18 13:40:52.087316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5d9a0f3e7b21'
+down_revision = 'c27b5e9f1a3d'
+branch_labels = None
+depends_on = None
+
+
+# Индексы по выражениям: колонки GENERATED ... STORED переписали бы таблицы под ACCESS EXCLUSIVE.
+# Выражения должны совпадать с `src.models.tickets.ticket_search_vector`/`comment_search_vector`,
+# иначе планировщик не использует индекс. Конфигурация 'simple' - `src.models.tickets.SEARCH_CONFIG`
+INDEXES = [
+    (
+        'ix_tickets_search_vector',
+        'tickets',
+        "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B')",
+    ),
+    ('ix_comments_search_vector', 'comments', "to_tsvector('simple'::regconfig, coalesce(body, ''))"),
+]
+
+
+def upgrade():
+    # Индексы строятся без блокировки записи в таблицы, поэтому вне транзакции
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            op.create_index(
+                name, table, [sa.text(f'({expression})')],
+                postgresql_using='gin', postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
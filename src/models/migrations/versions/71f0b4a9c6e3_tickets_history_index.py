@@ -0,0 +1,28 @@
+"""tickets history index
+
+Revision ID: 71f0b4a9c6e3
+Revises: e6b3c8d4f912
+Create Date: 2026-10-18 16:05:33.902157
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '71f0b4a9c6e3'
+down_revision = 'e6b3c8d4f912'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс строится без блокировки записи в таблицу, поэтому вне транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tickets_history_id_changed', 'tickets_history', ['id', 'changed'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tickets_history_id_changed', table_name='tickets_history', postgresql_concurrently=True)
@@ -0,0 +1,30 @@
+"""comments ticket index
+
+Revision ID: 8a4e2d61c0f7
+Revises: 3f1c9a7d2b64
+Create Date: 2026-10-18 11:03:47.120934
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '8a4e2d61c0f7'
+down_revision = '3f1c9a7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Индекс строится без блокировки записи в таблицу, поэтому вне транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_comments_ticket_id_created_at_id', 'comments', ['ticket_id', 'created_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_comments_ticket_id_created_at_id', table_name='comments', postgresql_concurrently=True,
+        )
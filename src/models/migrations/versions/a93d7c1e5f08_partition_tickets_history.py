@@ -0,0 +1,86 @@
+"""partition tickets history
+
+The primary key becomes (id, version, changed): PostgreSQL requires the partition key
+in it, so (id, version) is no longer enforced and stays unique by construction
+(`history_meta` writes every version once).
+
+The history is copied into the partitioned table by one INSERT in the migration
+transaction: the legacy table stays locked until the copy finishes, run it
+in a maintenance window on large histories.
+
+Revision ID: a93d7c1e5f08
+Revises: 71f0b4a9c6e3
+Create Date: 2026-10-18 17:12:48.364021
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a93d7c1e5f08'
+down_revision = '71f0b4a9c6e3'
+branch_labels = None
+depends_on = None
+
+# Колонки перечислены явно: `SELECT *` зависит от порядка колонок в обеих таблицах
+COLUMNS = (
+    "id, created_at, updated_at, created_by, updated_by, title, description, email, status, version, changed"
+)
+
+
+def upgrade():
+    op.execute("ALTER TABLE tickets_history RENAME TO tickets_history_legacy")
+    op.execute("ALTER TABLE tickets_history_legacy RENAME CONSTRAINT tickets_history_pkey TO tickets_history_legacy_pkey")
+    op.execute("ALTER INDEX ix_tickets_history_id_changed RENAME TO ix_tickets_history_legacy_id_changed")
+    op.execute("UPDATE tickets_history_legacy SET changed = updated_at WHERE changed IS NULL")
+
+    # Ключ секционирования должен входить в первичный ключ
+    op.execute(
+        """
+        CREATE TABLE tickets_history (LIKE tickets_history_legacy INCLUDING DEFAULTS)
+        PARTITION BY RANGE (changed)
+        """
+    )
+    op.execute("ALTER TABLE tickets_history ALTER COLUMN changed SET NOT NULL")
+    op.execute("ALTER TABLE tickets_history ADD CONSTRAINT tickets_history_pkey PRIMARY KEY (id, version, changed)")
+    op.execute("CREATE INDEX ix_tickets_history_id_changed ON tickets_history (id, changed)")
+    # Страховка на случай, если секция на месяц не создана заранее командой `history-partitions`
+    op.execute("CREATE TABLE tickets_history_default PARTITION OF tickets_history DEFAULT")
+
+    # Помесячные секции от самой старой записи до трех месяцев вперед
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            part_start timestamp := date_trunc('month', coalesce(
+                (SELECT min(changed) FROM tickets_history_legacy), now() AT TIME ZONE 'utc'
+            ));
+        BEGIN
+            WHILE part_start < date_trunc('month', now() AT TIME ZONE 'utc') + interval '4 months' LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF tickets_history FOR VALUES FROM (%L) TO (%L)',
+                    'tickets_history_' || to_char(part_start, 'YYYY_MM'),
+                    part_start,
+                    part_start + interval '1 month'
+                );
+                part_start := part_start + interval '1 month';
+            END LOOP;
+        END
+        $$
+        """
+    )
+
+    op.execute(f"INSERT INTO tickets_history ({COLUMNS}) SELECT {COLUMNS} FROM tickets_history_legacy")
+    op.execute("DROP TABLE tickets_history_legacy")
+
+
+def downgrade():
+    op.execute("ALTER TABLE tickets_history RENAME TO tickets_history_partitioned")
+    op.execute(
+        "ALTER TABLE tickets_history_partitioned RENAME CONSTRAINT tickets_history_pkey TO tickets_history_partitioned_pkey"
+    )
+    op.execute("ALTER INDEX ix_tickets_history_id_changed RENAME TO ix_tickets_history_partitioned_id_changed")
+    op.execute("CREATE TABLE tickets_history (LIKE tickets_history_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE tickets_history ADD CONSTRAINT tickets_history_pkey PRIMARY KEY (id, version)")
+    op.execute("CREATE INDEX ix_tickets_history_id_changed ON tickets_history (id, changed)")
+    op.execute(f"INSERT INTO tickets_history ({COLUMNS}) SELECT {COLUMNS} FROM tickets_history_partitioned")
+    op.execute("DROP TABLE tickets_history_partitioned")
@@ -0,0 +1,95 @@
+"""sharded ticket counters
+
+Revision ID: b4d7e2a9c1f6
+Revises: a93d7c1e5f08
+Create Date: 2026-10-18 19:05:37.219846
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'b4d7e2a9c1f6'
+down_revision = 'a93d7c1e5f08'
+branch_labels = None
+depends_on = None
+
+
+# Число строк счетчика на статус, совпадает с `src.models.tickets.COUNTER_SHARDS`
+COUNTER_SHARDS = 16
+
+# Одна строка на статус сериализовала все создания тикетов на ее блокировке. Теперь дельта
+# оператора пишется в строку секции соединения: параллельные транзакции разных соединений
+# обновляют разные строки, а строки одного оператора по-прежнему блокируются в порядке status
+APPLY_DELTAS = """
+    INSERT INTO ticket_counters (status, shard, count)
+    SELECT status, pg_backend_pid() % {shards}, sum(delta) FROM ({deltas}) AS deltas
+    GROUP BY status
+    ORDER BY status
+    ON CONFLICT (status, shard) DO UPDATE SET count = ticket_counters.count + EXCLUDED.count;
+"""
+
+APPLY_DELTAS_UNSHARDED = """
+    INSERT INTO ticket_counters (status, count)
+    SELECT status, sum(delta) FROM ({deltas}) AS deltas
+    GROUP BY status
+    ORDER BY status
+    ON CONFLICT (status) DO UPDATE SET count = ticket_counters.count + EXCLUDED.count;
+"""
+
+TRIGGER_DELTAS = {
+    'insert': 'SELECT status, 1 AS delta FROM new_rows',
+    'update': """
+        SELECT new_rows.status, 1 AS delta
+        FROM new_rows JOIN old_rows USING (id) WHERE new_rows.status <> old_rows.status
+        UNION ALL
+        SELECT old_rows.status, -1 AS delta
+        FROM new_rows JOIN old_rows USING (id) WHERE new_rows.status <> old_rows.status
+        """,
+    'delete': 'SELECT status, -1 AS delta FROM old_rows',
+}
+
+
+def replace_functions(apply_deltas: str) -> None:
+    for event, deltas in TRIGGER_DELTAS.items():
+        op.execute(
+            f"""
+            CREATE OR REPLACE FUNCTION ticket_counters_on_{event}() RETURNS trigger AS $$
+            BEGIN
+                {apply_deltas.format(deltas=deltas, shards=COUNTER_SHARDS)}
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+            """
+        )
+
+
+def upgrade():
+    # Существующие значения остаются в секции 0
+    op.execute("ALTER TABLE ticket_counters ADD COLUMN shard smallint NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE ticket_counters DROP CONSTRAINT ticket_counters_pkey")
+    op.execute("ALTER TABLE ticket_counters ADD PRIMARY KEY (status, shard)")
+    replace_functions(APPLY_DELTAS)
+
+
+def downgrade():
+    op.execute("LOCK TABLE ticket_counters IN EXCLUSIVE MODE")
+    # Секции сворачиваются в строку 0 каждого статуса
+    op.execute(
+        """
+        INSERT INTO ticket_counters (status, shard, count)
+        SELECT status, 0, 0 FROM unnest(enum_range(NULL::ticketstatus)) AS status
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        """
+        WITH removed AS (DELETE FROM ticket_counters WHERE shard <> 0 RETURNING status, count)
+        UPDATE ticket_counters SET count = ticket_counters.count + totals.count
+        FROM (SELECT status, sum(count) AS count FROM removed GROUP BY status) AS totals
+        WHERE ticket_counters.status = totals.status AND ticket_counters.shard = 0
+        """
+    )
+    op.execute("ALTER TABLE ticket_counters DROP CONSTRAINT ticket_counters_pkey")
+    op.execute("ALTER TABLE ticket_counters DROP COLUMN shard")
+    op.execute("ALTER TABLE ticket_counters ADD PRIMARY KEY (status)")
+    replace_functions(APPLY_DELTAS_UNSHARDED)
@@ -0,0 +1,40 @@
+"""tickets filter indexes
+
+Revision ID: c27b5e9f1a3d
+Revises: 8a4e2d61c0f7
+Create Date: 2026-10-18 12:21:09.553810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c27b5e9f1a3d'
+down_revision = '8a4e2d61c0f7'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_tickets_updated_at_id', ['updated_at', 'id'], None),
+    ('ix_tickets_status_updated_at_id', ['status', 'updated_at', 'id'], None),
+    ('ix_tickets_email_created_at_id', ['email', 'created_at', 'id'], None),
+    ('ix_tickets_created_by_created_at_id', ['created_by', 'created_at', 'id'], None),
+    ('ix_tickets_active_updated_at_id', ['updated_at', 'id'], sa.text("status <> 'CLOSED'")),
+]
+
+
+def upgrade():
+    # Индексы строятся без блокировки записи в таблицу, поэтому вне транзакции
+    with op.get_context().autocommit_block():
+        for name, columns, where in INDEXES:
+            op.create_index(
+                name, 'tickets', columns,
+                unique=False, postgresql_concurrently=True, postgresql_where=where,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='tickets', postgresql_concurrently=True)
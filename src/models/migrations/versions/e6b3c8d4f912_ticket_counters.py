@@ -0,0 +1,89 @@
+"""ticket counters
+
+Revision ID: e6b3c8d4f912
+Revises: 5d9a0f3e7b21
+Create Date: 2026-10-18 14:58:16.731402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'e6b3c8d4f912'
+down_revision = '5d9a0f3e7b21'
+branch_labels = None
+depends_on = None
+
+
+# Дельты применяются одним upsert на оператор, строки счетчиков блокируются в порядке status,
+# чтобы параллельные транзакции не взаимоблокировались
+APPLY_DELTAS = """
+    INSERT INTO ticket_counters (status, count)
+    SELECT status, sum(delta) FROM ({deltas}) AS deltas
+    GROUP BY status
+    ORDER BY status
+    ON CONFLICT (status) DO UPDATE SET count = ticket_counters.count + EXCLUDED.count;
+"""
+
+TRIGGERS = {
+    'insert': (
+        'REFERENCING NEW TABLE AS new_rows',
+        'SELECT status, 1 AS delta FROM new_rows',
+    ),
+    'update': (
+        'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+        """
+        SELECT new_rows.status, 1 AS delta
+        FROM new_rows JOIN old_rows USING (id) WHERE new_rows.status <> old_rows.status
+        UNION ALL
+        SELECT old_rows.status, -1 AS delta
+        FROM new_rows JOIN old_rows USING (id) WHERE new_rows.status <> old_rows.status
+        """,
+    ),
+    'delete': (
+        'REFERENCING OLD TABLE AS old_rows',
+        'SELECT status, -1 AS delta FROM old_rows',
+    ),
+}
+
+
+def upgrade():
+    op.create_table('ticket_counters',
+    sa.Column('status', postgresql.ENUM('OPEN', 'CLOSED', 'ANSWERED', 'WAIT_ANSWER', name='ticketstatus', create_type=False), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('status')
+    )
+
+    for event, (referencing, deltas) in TRIGGERS.items():
+        op.execute(
+            f"""
+            CREATE FUNCTION ticket_counters_on_{event}() RETURNS trigger AS $$
+            BEGIN
+                {APPLY_DELTAS.format(deltas=deltas)}
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql;
+
+            CREATE TRIGGER tickets_counters_{event}
+            AFTER {event.upper()} ON tickets
+            {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION ticket_counters_on_{event}();
+            """
+        )
+
+    # Начальные значения считаются под блокировкой, чтобы не потерять параллельные изменения
+    op.execute("LOCK TABLE tickets IN SHARE MODE")
+    op.execute(
+        """
+        INSERT INTO ticket_counters (status, count)
+        SELECT status, count(*) FROM tickets GROUP BY status
+        """
+    )
+
+
+def downgrade():
+    for event in TRIGGERS:
+        op.execute(f"DROP TRIGGER tickets_counters_{event} ON tickets")
+        op.execute(f"DROP FUNCTION ticket_counters_on_{event}()")
+    op.drop_table('ticket_counters')
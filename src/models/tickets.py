@@ -1,11 +1,17 @@
 import enum
 
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import relationship
 from sqlalchemy import (
+    BigInteger,
     Column,
     String,
     Enum,
+    Index,
+    SmallInteger,
+    literal_column,
+    text,
 )
 
 from src.db.postgresql import Base
@@ -16,6 +22,24 @@ from src.models.history_meta import Versioned
 from src.models.comments import Comment             # noqa: F401
 
 
+# Конфигурация полнотекстового поиска, совпадает с выражениями индексов `search_vector` в миграции
+SEARCH_CONFIG = 'simple'
+
+# Документы поиска - те же выражения, по которым построены GIN-индексы миграции `full text search`:
+# хранимых колонок нет, планировщик использует индекс, только пока выражения совпадают.
+# Конфигурация подставлена литералом: параметр не сопоставится с выражением индекса
+ticket_search_vector = literal_column(
+    f"(setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(tickets.title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(tickets.description, '')), 'B'))",
+    type_=TSVECTOR,
+)
+comment_search_vector = literal_column(
+    f"to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(comments.body, ''))", type_=TSVECTOR,
+)
+# Индексы по выражениям существуют только в миграциях, autogenerate их пропускает
+UNMAPPED_INDEXES = {'ix_tickets_search_vector', 'ix_comments_search_vector'}
+
+
 class TicketStatus(enum.Enum):
     OPEN = 'open'
     CLOSED = 'closed'
@@ -42,6 +66,25 @@ class Ticket(Versioned, Base, BaseMixin, TicketMixin):
     links: one-to-many with Comments model
     """  
 
+    # UPDATE/DELETE через ORM содержат `WHERE version = <прочитанная версия>`: изменение,
+    # решение о котором принято по устаревшей версии, не применяется (StaleDataError)
+    use_mapper_versioning = True
+
+    __table_args__ = (
+        # keyset-пагинация списка тикетов по (created_at, id)
+        Index('ix_tickets_created_at_id', 'created_at', 'id'),
+        # фильтры и сортировки списка тикетов
+        Index('ix_tickets_updated_at_id', 'updated_at', 'id'),
+        Index('ix_tickets_status_updated_at_id', 'status', 'updated_at', 'id'),
+        Index('ix_tickets_email_created_at_id', 'email', 'created_at', 'id'),
+        Index('ix_tickets_created_by_created_at_id', 'created_by', 'created_at', 'id'),
+        # очередь агентов: незакрытые тикеты по времени последнего изменения
+        Index(
+            'ix_tickets_active_updated_at_id', 'updated_at', 'id',
+            postgresql_where=text("status <> 'CLOSED'"),
+        ),
+    )
+
     @declared_attr
     def comment(cls):                               # pylint: disable=no-self-argument
         return relationship(
@@ -49,3 +92,30 @@ class Ticket(Versioned, Base, BaseMixin, TicketMixin):
             backref="ticket",
             cascade="all, delete"
         )
+
+
+# История изменений тикета: постраничный вывод по версиям и состояние на момент времени
+Index(
+    'ix_tickets_history_id_changed',
+    Ticket.__history_mapper__.local_table.c.id,                 # pylint: disable=no-member
+    Ticket.__history_mapper__.local_table.c.changed,            # pylint: disable=no-member
+)
+
+
+# Строк счетчика на статус: триггер пишет дельту в секцию `pg_backend_pid() % COUNTER_SHARDS`
+COUNTER_SHARDS = 16
+
+
+class TicketCounter(Base):
+    """Number of tickets by status, the sum over the shards of the status
+
+    Rows are maintained by statement-level triggers on `tickets` (see migrations `ticket counters`
+    and `sharded ticket counters`), so counters change in the same transaction as tickets.
+    Concurrent transactions of different connections update different shards.
+    """
+
+    __tablename__ = 'ticket_counters'
+
+    status = Column(Enum(TicketStatus), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0)
+    count = Column(BigInteger, nullable=False, default=0)
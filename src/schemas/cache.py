@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class CacheStats(BaseModel):
+    # Кэш воркера, обработавшего запрос: у каждого воркера свои счетчики
+    enabled: bool = False
+    size: int = 0
+    max_size: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
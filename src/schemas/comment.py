@@ -38,6 +38,18 @@ class CommentCreate(CommentBase):
         self.updated_by = self.created_by
 
 
+# Импорт из старой системы: идентификаторы и даты сохраняются, если заданы
+class CommentImport(CommentCreate):
+    id: Optional[UUID]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        # `Create` схема подставляет автора, а при импорте последний редактор известен
+        self.updated_by = data.get('updated_by') or self.created_by
+
+
 class CommentUpdate(CommentBase):
     body: str
     updated_by: str
@@ -57,6 +69,7 @@ class Comment(CommentInDBBase):
 
 
 class CommentFull(CommentInDBBase):
+    ticket_id: Optional[UUID]
     created_by: Optional[str]
     updated_by: Optional[str]
 
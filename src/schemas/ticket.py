@@ -1,7 +1,8 @@
+import enum
 import orjson
 
 from datetime import datetime
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Dict
 from uuid import UUID
 from pydantic import (
     BaseModel,
@@ -30,6 +31,43 @@ class TransactionStatus:
         return [TicketStatus.WAIT_ANSWER, TicketStatus.CLOSED]
 
 
+class TicketSort(str, enum.Enum):
+    CREATED_AT = 'created_at'
+    CREATED_AT_DESC = '-created_at'
+    UPDATED_AT = 'updated_at'
+    UPDATED_AT_DESC = '-updated_at'
+
+    @property
+    def column(self) -> str:
+        return self.value.lstrip('-')
+
+    @property
+    def descending(self) -> bool:
+        return self.value.startswith('-')
+
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = 'ndjson'
+    CSV = 'csv'
+
+
+class ExportInclude(str, enum.Enum):
+    COMMENTS = 'comments'
+
+
+# Фильтры и порядок списка тикетов, параметры запроса разбирает `src.api.v1.params.get_ticket_filter`
+class TicketFilter(BaseModel):
+    status: Optional[List[TicketStatus]] = None
+    active: Optional[bool] = None
+    email: Optional[str] = None
+    created_by: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    updated_from: Optional[datetime] = None
+    updated_to: Optional[datetime] = None
+    sort: TicketSort = TicketSort.CREATED_AT
+
+
 # Shared properties
 class TicketBase(BaseModel):
     status: TicketStatus = Field(
@@ -60,6 +98,20 @@ class TicketCreate(TicketBase):
         self.updated_by = self.created_by
 
 
+# Импорт из старой системы: идентификаторы и даты сохраняются, если заданы
+class TicketImport(TicketCreate):
+    id: Optional[UUID]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    # Версия из файла сохраняется, чтобы импортированная история тикета ей соответствовала
+    version: Optional[int]
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        # `Create` схема подставляет автора, а при импорте последний редактор известен
+        self.updated_by = data.get('updated_by') or self.created_by
+
+
 class TicketUpdate(TicketBase):
     updated_by: str
 
@@ -77,7 +129,67 @@ class Ticket(TicketInDBBase):
     pass
 
 
+class TicketPage(BaseModel):
+    # Страница списка в кэше вместе с курсором следующей страницы,
+    # тикеты хранятся готовыми к ответу словарями схемы `Ticket` и не валидируются при чтении
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
+
+class TicketState(BaseModel):
+    # Статус тикета в кэше для проверок перед записью комментария
+    status: TicketStatus
+
+
+class TicketHistory(TicketInDBBase):
+    version: int
+    changed: Optional[datetime]
+    updated_at: Optional[datetime]
+    description: Optional[str]
+    email: Optional[str]
+    created_by: Optional[str]
+    updated_by: Optional[str]
+
+
+class TicketHistoryImport(TicketHistory):
+    id: UUID
+    title: str
+    email: str
+    changed: datetime
+    created_at: datetime
+    updated_at: datetime
+    created_by: str
+    updated_by: str
+
+
+class TicketSearchResult(Ticket):
+    rank: float
+
+
 class TicketFull(TicketInDBBase):
     updated_at: Optional[datetime]
     description: Optional[str]
+    # Номер версии из `history_meta`, входит в ETag
+    version: Optional[int]
+    # Последние комментарии (новые первыми), полный список - GET /v1/ticket/{ticket_id}/comments
     comment: List[Comment] = Field(..., alias='comments')
+    comments_count: int = 0
+
+
+class TicketBulkError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class TicketBulkResult(BaseModel):
+    # Позиции совпадают с позициями во входном списке, у невалидных элементов `null`
+    ids: List[Optional[UUID]]
+    errors: List[TicketBulkError]
+
+
+class TicketStats(BaseModel):
+    open: int = 0
+    answered: int = 0
+    wait_answer: int = 0
+    closed: int = 0
+    total: int = 0
@@ -0,0 +1,341 @@
+import asyncio
+import csv
+import enum
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Type, Union
+
+import orjson
+import psycopg2
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import Table, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from src.core.modules import Cache
+from src.db import postgresql
+from src.models import comments as comment_model, tickets as ticket_model
+from src.schemas import comment as comment_schema, ticket as ticket_schema
+from src.services.crud.base import CRUDBase, chunks
+
+
+log = logging.getLogger(__name__)
+
+# Что можно импортировать: схема валидации и модель, в таблицу которой пишутся строки
+ENTITIES: Dict[str, Tuple[Type[BaseModel], Table]] = {
+    "tickets": (ticket_schema.TicketImport, ticket_model.Ticket.__table__),
+    "comments": (comment_schema.CommentImport, comment_model.Comment.__table__),
+    "history": (
+        ticket_schema.TicketHistoryImport,
+        ticket_model.Ticket.__history_mapper__.local_table,             # pylint: disable=no-member
+    ),
+}
+MODELS = {"tickets": ticket_model.Ticket, "comments": comment_model.Comment}
+
+# Триггеры счетчиков тикетов по статусам (миграция `ticket counters`)
+COUNTER_TRIGGERS = ("tickets_counters_insert", "tickets_counters_update", "tickets_counters_delete")
+
+Record = Union[bytes, Dict[str, Any]]
+
+
+@dataclass
+class ChunkResult:
+    index: int
+    loaded: int = 0
+    # Строки, уже бывшие в таблице: повтор чанка после сбоя до отметки в checkpoint
+    skipped: int = 0
+    # Номер записи, ошибка и исходная запись: строка NDJSON или строка CSV
+    rejected: List[Tuple[int, str, Union[str, Dict[str, Any]]]] = field(default_factory=list)
+    error: Optional[str] = None
+    # Ключи кэша, затронутые строками чанка: сами объекты и их родители
+    entity_keys: Set[str] = field(default_factory=set)
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """NDJSON lines are parsed by the workers, CSV rows are parsed here by `csv.DictReader`"""
+    if path.endswith(".csv"):
+        with open(path, newline="") as source:
+            for row in csv.DictReader(source):
+                # Пустая ячейка CSV - отсутствующее значение
+                yield {key: value if value != "" else None for key, value in row.items()}
+    else:
+        with open(path, "rb") as source:
+            for line in source:
+                if line.strip():
+                    yield line
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[Tuple[int, int, List[Record]]]:
+    """(chunk index, number of the first record, records)"""
+    chunk: List[Record] = []
+    index = first = 0
+    for number, record in enumerate(read_records(path)):
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield index, first, chunk
+            index, first, chunk = index + 1, number + 1, []
+    if chunk:
+        yield index, first, chunk
+
+
+def copy_value(value: Any) -> str:
+    """Value in the PostgreSQL COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, enum.Enum):
+        # SQLAlchemy `Enum` хранит имена членов перечисления
+        return value.name
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _init_worker() -> None:
+    # Соединения пула родительского процесса не должны использоваться после fork
+    postgresql.engine.dispose()
+
+
+def copy_rows(connection: Connection, staging: str, rows: List[Dict[str, Any]], columns: List[str]) -> None:
+    """COPY rows into the staging table, grouped by the columns they have: absent columns
+    take the defaults of the staging table, the same as of the target table"""
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(column for column in columns if column in row), []).append(row)
+
+    with connection.connection.cursor() as cursor:
+        for group_columns, group_rows in groups.items():
+            buffer = io.StringIO()
+            for row in group_rows:
+                buffer.write("\t".join(copy_value(row[column]) for column in group_columns) + "\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {staging} ({', '.join(group_columns)}) FROM STDIN", buffer)
+
+
+def load_chunk(entity: str, index: int, first: int, records: List[Record]) -> ChunkResult:
+    """Validate records and write them in a separate transaction: COPY into a temporary table,
+    then INSERT skipping rows already present, so a chunk loaded again after a crash adds nothing.
+    When the database rejects the chunk (e.g. a comment of an unknown ticket), rows are inserted
+    one by one and the failing ones are reported with the validation rejects"""
+    schema, table = ENTITIES[entity]
+    model = MODELS.get(entity)
+    defaults = CRUDBase(model) if model else None
+
+    result = ChunkResult(index=index)
+    valid: List[Tuple[int, Dict[str, Any], Union[str, Dict[str, Any]]]] = []
+    for number, record in enumerate(records, start=first):
+        source = record if isinstance(record, dict) else record.decode(errors="replace").rstrip("\r\n")
+        try:
+            values = (record if isinstance(record, dict) else orjson.loads(record))     # pylint: disable=no-member
+            obj = schema.parse_obj(values)
+        except (ValueError, ValidationError) as error:
+            result.rejected.append((number, str(error), source))
+            continue
+
+        row = {key: value for key, value in obj.dict().items() if value is not None}
+        if defaults:
+            row = defaults._apply_defaults(row)         # pylint: disable=protected-access
+        valid.append((number, row, source))
+
+    if not valid:
+        return result
+
+    rows = [row for _, row, _ in valid]
+    # Только колонки, заданные хотя бы в одной строке: остальные получают значения по умолчанию сервера
+    columns = [column.key for column in table.c if any(column.key in row for row in rows)]
+    column_list = ", ".join(columns)
+    staging = f"import_{table.name}"
+    written = []
+    try:
+        with postgresql.engine.connect() as connection, connection.begin():
+            try:
+                with connection.begin_nested():
+                    connection.execute(
+                        text(f"CREATE TEMPORARY TABLE {staging} (LIKE {table.name} INCLUDING DEFAULTS) ON COMMIT DROP")
+                    )
+                    copy_rows(connection, staging, rows, columns)
+                    inserted = connection.execute(text(
+                        f"INSERT INTO {table.name} ({column_list}) SELECT {column_list} FROM {staging} "
+                        "ON CONFLICT DO NOTHING"
+                    )).rowcount
+                written = rows
+            except (DBAPIError, psycopg2.Error):
+                # Ошибочная строка не должна блокировать остальные строки чанка при каждом перезапуске
+                inserted = 0
+                for number, row, source in valid:
+                    try:
+                        with connection.begin_nested():
+                            inserted += connection.execute(insert(table).values(row).on_conflict_do_nothing()).rowcount
+                        written.append(row)
+                    except DBAPIError as error:
+                        result.rejected.append((number, str(error.orig), source))
+    except Exception as error:          # pylint: disable=broad-except
+        result.error = str(error)
+        return result
+
+    result.loaded = inserted
+    result.skipped = len(written) - inserted
+    if defaults:
+        for row in written:
+            result.entity_keys.update(defaults._cache_dependencies(row))     # pylint: disable=protected-access
+    return result
+
+
+class Checkpoint:
+    """Indexes of loaded chunks, a restarted import skips them"""
+
+    def __init__(self, path: str, source: str, chunk_size: int):
+        self.path = path
+        self.done: Set[int] = set()
+        self.source = source
+        self.chunk_size = chunk_size
+        if os.path.exists(path):
+            with open(path) as checkpoint_file:
+                state = json.load(checkpoint_file)
+            if state["source"] != source or state["chunk_size"] != chunk_size:
+                raise ValueError(f"Checkpoint {path} was made for another file or chunk size")
+            self.done = set(state["done"])
+
+    def mark(self, index: int) -> None:
+        self.done.add(index)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as checkpoint_file:
+            json.dump({"source": self.source, "chunk_size": self.chunk_size, "done": sorted(self.done)}, checkpoint_file)
+        os.replace(tmp_path, self.path)
+
+
+def write_rejects(path: str, result: ChunkResult) -> None:
+    """Append rejected records of a chunk to the NDJSON rejects file"""
+    with open(path, "ab") as rejects_file:
+        for number, error, source in result.rejected:
+            line = {"chunk": result.index, "record": number, "error": error, "source": source}
+            rejects_file.write(orjson.dumps(line) + b"\n")     # pylint: disable=no-member
+        rejects_file.flush()
+        os.fsync(rejects_file.fileno())
+
+
+def set_counter_triggers(enabled: bool) -> None:
+    action = "ENABLE" if enabled else "DISABLE"
+    with postgresql.engine.begin() as connection:
+        for trigger in COUNTER_TRIGGERS:
+            connection.execute(text(f"ALTER TABLE tickets {action} TRIGGER {trigger}"))
+
+
+async def invalidate_cache(cache: Cache, entity: str, entity_keys: Set[str]) -> None:
+    """Drop cache entries of the loaded objects and their parents, make list pages stale"""
+    if entity not in MODELS:
+        return
+
+    async with cache.batch() as batch:
+        for keys in chunks(sorted(entity_keys), 1000):
+            batch.invalidate(keys)
+        batch.bump_generation(MODELS[entity].__tablename__)
+
+
+async def import_file(
+    entity: str,
+    path: str,
+    *,
+    chunk_size: int,
+    workers: int,
+    checkpoint_path: Optional[str] = None,
+    rejects_path: Optional[str] = None,
+    cache: Optional[Cache] = None,
+    defer_cache: bool = False,
+    report_every: float = 10,
+) -> Tuple[int, int, int]:
+    """Load a NDJSON or CSV file with parallel workers, each chunk is a COPY in its own transaction.
+    Rows already in the table are skipped, so a resumed import may repeat the last chunks.
+
+    Args:
+        entity (str): `tickets`, `comments` or `history`
+        path (str): source file, `.csv` or NDJSON
+        chunk_size (int): records per COPY
+        workers (int): number of worker processes
+        checkpoint_path (Optional[str]): file with loaded chunks, by default `<path>.checkpoint`
+        rejects_path (Optional[str]): NDJSON file for rejected records, by default `<path>.rejects`
+        cache (Optional[Cache]): cache to invalidate, `None` - don't touch the cache
+        defer_cache (bool): invalidate the cache once after the load instead of after every chunk,
+            affected keys are kept in memory until then
+        report_every (float): throughput log interval in seconds
+
+    Returns:
+        Tuple[int, int, int]: loaded rows, rejected rows, failed chunks
+    """
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint", os.path.abspath(path), chunk_size)
+    rejects_path = rejects_path or f"{path}.rejects"
+    loaded = rejected = failed = 0
+    started = reported = time.monotonic()
+    deferred_keys: Set[str] = set()
+
+    async def collect(result: ChunkResult) -> None:
+        nonlocal loaded, rejected, failed, reported
+        if result.error:
+            failed += 1
+            log.error("Chunk %s failed and will be retried on the next run: %s", result.index, result.error)
+            return
+
+        # Отклоненные записи пишутся до отметки чанка: при сбое между ними чанк повторится
+        # и его записи попадут в файл еще раз, но ни одна не потеряется
+        if result.rejected:
+            rejected += len(result.rejected)
+            write_rejects(rejects_path, result)
+            log.warning("Chunk %s: %s records rejected, see %s", result.index, len(result.rejected), rejects_path)
+        if result.skipped:
+            log.info("Chunk %s: %s rows were already loaded", result.index, result.skipped)
+
+        loaded += result.loaded
+        checkpoint.mark(result.index)
+        if cache is not None:
+            if defer_cache:
+                deferred_keys.update(result.entity_keys)
+            else:
+                await invalidate_cache(cache, entity, result.entity_keys)
+
+        now = time.monotonic()
+        if now - reported >= report_every:
+            reported = now
+            log.info("Loaded %s %s, %.0f rows/s", loaded, entity, loaded / (now - started))
+
+    loop = asyncio.get_event_loop()
+    # Закрытие унаследованного соединения в воркере завершает и сессию родителя на том же сокете:
+    # пул освобождается до fork, воркеры открывают свои соединения
+    postgresql.engine.dispose()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending: Set[asyncio.Future] = set()
+        for index, first, records in read_chunks(path, chunk_size):
+            if index in checkpoint.done:
+                continue
+            # Читаем файл не быстрее, чем пишут воркеры, чтобы память не росла
+            if len(pending) >= workers * 2:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    await collect(future.result())
+            pending.add(loop.run_in_executor(executor, load_chunk, entity, index, first, records))
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            for future in done:
+                await collect(future.result())
+
+    if cache is not None and defer_cache:
+        await invalidate_cache(cache, entity, deferred_keys)
+
+    elapsed = time.monotonic() - started
+    log.info(
+        "Import of %s finished: %s loaded, %s rejected, %s chunks failed, %.0f rows/s",
+        entity, loaded, rejected, failed, loaded / elapsed if elapsed else 0,
+    )
+    return loaded, rejected, failed
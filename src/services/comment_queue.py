@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aioredis import Redis
+from aioredis.exceptions import ResponseError
+from asyncpg.exceptions import IntegrityConstraintViolationError
+from databases import Database
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert
+
+from src.core.config.app_settings import AppSettings
+from src.core.events import TICKET_EVENTS_CHANNEL, ticket_event
+from src.models import comments as comment_model
+from src.schemas import comment as comment_schema
+from src.services.crud.base import BULK_CHUNK_SIZE, chunks
+from src.services.crud.comment import COMMENT_STREAM, CommentService, comment_serializer
+
+
+app_config = AppSettings()
+log = logging.getLogger(__name__)
+
+# Группа потребителей очереди: каждое сообщение обрабатывает один воркер
+COMMENT_GROUP = 'comment-writers'
+# Сообщения, которые не удалось записать: некорректные, с нарушением ограничений базы
+# или не подтвержденные за `comment_queue_max_deliveries` доставок
+DEAD_LETTER_STREAM = 'queue:comments:dead'
+
+# Пауза перед повторной попыткой после ошибки Redis или базы
+RETRY_DELAY_SECONDS = 1
+
+Message = Tuple[bytes, Dict[bytes, bytes]]
+
+
+def consumer_name() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+async def ensure_group(redis: Redis) -> None:
+    """Create the stream and the consumer group, the group reads the stream from the beginning"""
+    try:
+        await redis.xgroup_create(COMMENT_STREAM, COMMENT_GROUP, id='0', mkstream=True)
+    except ResponseError as error:
+        if 'BUSYGROUP' not in str(error):
+            raise
+
+
+async def claim_stale(redis: Redis, consumer: str) -> Tuple[List[Message], Set[bytes]]:
+    """Take over messages not acknowledged by their consumers (e.g. the worker was restarted)
+
+    Returns:
+        Tuple[List[Message], Set[bytes]]: claimed messages and IDs of those delivered too many times
+    """
+    idle = app_config.comment_queue_claim_idle_ms
+    pending = await redis.xpending_range(
+        COMMENT_STREAM, COMMENT_GROUP, '-', '+', app_config.comment_queue_batch_size,
+    )
+    stale = [item for item in pending if item['time_since_delivered'] >= idle]
+    if not stale:
+        return [], set()
+
+    exhausted = {
+        item['message_id'] for item in stale if item['times_delivered'] >= app_config.comment_queue_max_deliveries
+    }
+    claimed = await redis.xclaim(COMMENT_STREAM, COMMENT_GROUP, consumer, idle, [item['message_id'] for item in stale])
+    return claimed, exhausted
+
+
+async def insert_comments(database: Database, rows: List[Dict[str, Any]]) -> List[Tuple[int, str]]:
+    """Insert comments, already written IDs (repeated delivery) are skipped.
+    When the batch violates a constraint (e.g. the ticket was deleted) comments are inserted one by one.
+
+    Returns:
+        List[Tuple[int, str]]: indexes of rejected rows and errors
+    """
+    table = comment_model.Comment.__table__
+    try:
+        async with database.transaction():
+            for chunk in chunks(rows, BULK_CHUNK_SIZE):
+                await database.execute(insert(table).values(chunk).on_conflict_do_nothing(index_elements=['id']))
+        return []
+    except IntegrityConstraintViolationError:
+        pass
+
+    rejected = []
+    for index, row in enumerate(rows):
+        try:
+            await database.execute(insert(table).values(row).on_conflict_do_nothing(index_elements=['id']))
+        except IntegrityConstraintViolationError as error:
+            rejected.append((index, str(error)))
+    return rejected
+
+
+async def process_messages(
+    redis: Redis, database: Database, service: CommentService, messages: List[Message], exhausted: Set[bytes],
+) -> None:
+    """Write a batch of queued comments, then acknowledge the messages.
+    A failure before XACK leaves the messages pending, they are delivered again (at-least-once)
+    and inserted idempotently by their comment IDs."""
+    message_ids = [message_id for message_id, _ in messages]
+    rows: List[Dict[str, Any]] = []
+    accepted: List[Message] = []
+    dead: List[Tuple[Message, str]] = []
+    dead_rows: List[Dict[str, Any]] = []
+    pending_keys: List[str] = []
+    for message in messages:
+        message_id, fields = message
+        # Сообщение, удаленное из потока после выдачи, подтверждается без обработки
+        if not fields:
+            continue
+        try:
+            row = service._apply_defaults(              # pylint: disable=protected-access
+                comment_schema.CommentImport.parse_raw(fields[b'comment']).dict()
+            )
+        except (KeyError, ValueError, ValidationError) as error:
+            dead.append((message, str(error)))
+            continue
+
+        comment_key = service.cache.make_key(service.model.__tablename__, row['id'])
+        pending_keys.append(service.cache.make_pending_key(comment_key))
+        if message_id in exhausted:
+            dead.append((message, 'too many deliveries'))
+            dead_rows.append(row)
+            continue
+        rows.append(row)
+        accepted.append(message)
+
+    rejected = dict(await insert_comments(database, rows)) if rows else {}
+    dead.extend((message, rejected[index]) for index, message in enumerate(accepted) if index in rejected)
+    dead_rows.extend(row for index, row in enumerate(rows) if index in rejected)
+    written = [row for index, row in enumerate(rows) if index not in rejected]
+
+    # Кэш сбрасывается до удаления ожидающих записей: комментарий все время виден по ID
+    if written:
+        await service._invalidate(written)         # pylint: disable=protected-access
+
+    pipe = redis.pipeline(transaction=True)
+    for (message_id, fields), error in dead:
+        log.error("Queued comment %s is moved to %s: %s", message_id, DEAD_LETTER_STREAM, error)
+        pipe.xadd(DEAD_LETTER_STREAM, {**fields, b'error': error.encode()})
+    if pending_keys:
+        pipe.delete(*pending_keys)
+    for row in written:
+        pipe.publish(TICKET_EVENTS_CHANNEL, ticket_event('comment.created', row['ticket_id'], comment_serializer.dump(row)))
+    pipe.xack(COMMENT_STREAM, COMMENT_GROUP, *message_ids)
+    pipe.xdel(COMMENT_STREAM, *message_ids)
+    await pipe.execute()
+
+    # Незаписанный комментарий мог попасть в кэш из ожидающей копии. Сброс идет после удаления
+    # копии: иначе читатель успел бы заполнить кэш из нее снова
+    if dead_rows:
+        await service._invalidate(dead_rows)       # pylint: disable=protected-access
+
+
+async def consume_comments(redis: Redis, database: Database) -> None:
+    """Background task: write comments accepted by `CommentService.create_queued` to the database.
+
+    Every worker is a consumer of one group, so each message is handled once. Messages left
+    unacknowledged by a stopped worker are claimed by the others after `comment_queue_claim_idle_ms`.
+    """
+    service = CommentService(comment_model.Comment, redis=redis)
+    consumer = consumer_name()
+    claimed_at: Optional[float] = None
+    claim_interval = app_config.comment_queue_claim_idle_ms / 1000
+
+    while True:
+        try:
+            await ensure_group(redis)
+            while True:
+                messages: List[Message] = []
+                exhausted: Set[bytes] = set()
+                if claimed_at is None or time.monotonic() - claimed_at >= claim_interval:
+                    claimed_at = time.monotonic()
+                    messages, exhausted = await claim_stale(redis, consumer)
+
+                if not messages:
+                    response = await redis.xreadgroup(
+                        COMMENT_GROUP,
+                        consumer,
+                        {COMMENT_STREAM: '>'},
+                        count=app_config.comment_queue_batch_size,
+                        block=app_config.comment_queue_block_ms,
+                    )
+                    messages = response[0][1] if response else []
+
+                if messages:
+                    await process_messages(redis, database, service, messages, exhausted)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:          # pylint: disable=broad-except
+            # Необработанные сообщения остаются в очереди и будут доставлены повторно
+            log.warning("Comment queue consumer failed: %s", error)
+            await asyncio.sleep(RETRY_DELAY_SECONDS)
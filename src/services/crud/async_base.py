@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import Optional, List, Union, Dict, Any, Mapping, Tuple, Sequence, AsyncIterator
+from uuid import UUID
+
+from databases import Database
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import ONETOMANY
+from sqlalchemy.sql import ClauseElement
+
+from src.services.crud.base import (
+    CRUDBase,
+    ModelType,
+    CreateSchemaType,
+    UpdateSchemaType,
+    BULK_CHUNK_SIZE,
+    chunks,
+)
+
+
+class AsyncCRUDBase(CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
+    """
+        CRUD object on top of the `databases` (asyncpg) connection pool.
+        Queries are built with SQLAlchemy Core, so none of them blocks the event loop.
+        Methods return transient instances of `model`, so the services code
+        works the same way as with the SQLAlchemy `Session`.
+    """
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    def _to_model(self, row: Mapping[str, Any]) -> ModelType:
+        return self.model(**dict(row))                  # type: ignore
+
+    def _init_collections(self, db_obj: ModelType) -> None:
+        """New object has no children yet, mark its collections as loaded"""
+        for relation in inspect(self.model).relationships:
+            if relation.direction is ONETOMANY:
+                set_committed_value(db_obj, relation.key, [])
+
+    async def _fetch_one(self, db: Database, query: ClauseElement) -> Optional[Mapping[str, Any]]:
+        return await db.fetch_one(query)
+
+    async def _fetch_all(self, db: Database, query: ClauseElement) -> List[Mapping[str, Any]]:
+        return await db.fetch_all(query)
+
+    async def _execute(self, db: Database, query: ClauseElement) -> None:
+        await db.execute(query)
+
+    async def _iterate(self, db: Database, query: ClauseElement) -> AsyncIterator[Mapping[str, Any]]:
+        # asyncpg читает строки через курсор на стороне сервера внутри транзакции
+        async for row in db.iterate(query):
+            yield row
+
+    async def _create_history(self, db: Database, db_obj: ModelType, changed: datetime) -> None:
+        """Write previous state of a versioned object to the history table"""
+        history_table = self.model.__history_mapper__.local_table     # type: ignore
+        values = {
+            column.key: getattr(db_obj, column.key)
+            for column in history_table.c
+            if "version_meta" not in column.info
+        }
+        values["version"] = db_obj.version                             # type: ignore
+        values["changed"] = changed
+        await db.execute(history_table.insert().values(**values))
+
+    async def get(self, db: Database, item_id: UUID) -> Optional[ModelType]:
+        row = await db.fetch_one(self.table.select().where(self.table.c.id == item_id))
+        if not row:
+            return None
+
+        return self._to_model(row)
+
+    async def list(
+        self, db: Database, *, skip: int = 0, limit: int = 100, filters: Sequence[Any] = (), order_by: Sequence[Any] = ()
+    ) -> List[ModelType]:
+        query = self.table.select().order_by(*order_by).offset(skip * limit).limit(limit)
+        for criterion in filters:
+            query = query.where(criterion)
+
+        rows = await db.fetch_all(query)
+        return [self._to_model(row) for row in rows]
+
+    async def list_after(
+        self,
+        db: Database,
+        *,
+        after: Optional[str] = None,
+        limit: int = 100,
+        filters: Sequence[Any] = (),
+        columns: Optional[Sequence[str]] = None,
+        descending: bool = False,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        columns = columns or self.cursor_columns
+        criteria, order_by = self._keyset(after, columns, descending)
+        criteria.extend(filters)
+        query = self.table.select().order_by(*order_by).limit(limit)
+        for criterion in criteria:
+            query = query.where(criterion)
+
+        rows = await db.fetch_all(query)
+        items = [self._to_model(row) for row in rows]
+        return items, self._next_cursor(items, limit, columns, descending)
+
+    async def create(self, db: Database, *, obj_in: CreateSchemaType) -> ModelType:
+        values = self._apply_defaults(obj_in.dict())
+        row = await db.fetch_one(self.table.insert().values(**values).returning(*self.table.c))
+        db_obj = self._to_model(row)
+        self._init_collections(db_obj)
+        await self._invalidate([db_obj])
+        return db_obj
+
+    async def create_many(self, db: Database, *, objs_in: List[CreateSchemaType]) -> List[UUID]:
+        rows = [self._apply_defaults(obj_in.dict()) for obj_in in objs_in]
+        async with db.transaction():
+            for chunk in chunks(rows, BULK_CHUNK_SIZE):
+                await db.execute(self.table.insert().values(chunk))
+        await self._invalidate(rows)
+        return [row["id"] for row in rows]
+
+    async def update(
+        self, db: Database, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+
+        values = self._apply_defaults(
+            {key: value for key, value in update_data.items() if key in self.table.c},
+            onupdate=True,
+        )
+
+        query = self.table.update().where(self.table.c.id == db_obj.id)
+        async with db.transaction():
+            if hasattr(self.model, "__history_mapper__"):
+                await self._create_history(db, db_obj, values.get("updated_at", datetime.utcnow()))
+                values["version"] = self.table.c.version + 1
+                # Как `use_mapper_versioning` в ORM: строка обновляется, только пока ее версия - прочитанная
+                query = query.where(self.table.c.version == db_obj.version)
+
+            row = await db.fetch_one(query.values(**values).returning(*self.table.c))
+            if row is None:
+                # Откат транзакции отменяет и запись истории
+                if hasattr(self.model, "__history_mapper__"):
+                    raise self._version_mismatch(db_obj.version)
+                raise self._not_found(db_obj.id)
+
+        db_obj = self._to_model(row)
+        await self._invalidate([db_obj])
+        return db_obj
+
+    async def remove(self, db: Database, *, item_id: UUID) -> ModelType:
+        async with db.transaction():
+            remove_db_obj = await AsyncCRUDBase.get(self, db, item_id)
+            if remove_db_obj is None:
+                raise self._not_found(item_id)
+
+            # Каскадное удаление связанных объектов, как `cascade="all, delete"` в ORM
+            for relation in inspect(self.model).relationships:
+                if relation.direction is ONETOMANY and relation.cascade.delete:
+                    (_, remote_col), = relation.local_remote_pairs
+                    await db.execute(relation.mapper.local_table.delete().where(remote_col == item_id))
+
+            if hasattr(self.model, "__history_mapper__"):
+                await self._create_history(db, remove_db_obj, datetime.utcnow())
+
+            await db.execute(self.table.delete().where(self.table.c.id == item_id))
+
+        await self._invalidate([remove_db_obj])
+        return remove_db_obj
+
@@ -1,20 +1,42 @@
-from typing import TypeVar, Generic, Type, Optional, List, Union, Dict, Any
+from datetime import datetime
+from typing import (
+    TypeVar, Generic, Type, Optional, List, Union, Dict, Any, Mapping, Sequence, Tuple, Iterator, AsyncIterator,
+)
 from uuid import UUID
 
 from pydantic import BaseModel
-from fastapi.encoders import jsonable_encoder
+from sqlalchemy import DateTime, inspect, literal, tuple_
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm.interfaces import MANYTOONE
+from sqlalchemy.sql import ClauseElement
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
 from aioredis import Redis
 
-from src.core.modules import Cache
+from src.core import exceptions
+from src.core.modules import Cache, encode_cursor, decode_cursor
 from src.models.base_mixins import BaseMixin
 
 ModelType = TypeVar("ModelType", bound=BaseMixin)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# Сколько строк за раз читается из курсора на стороне сервера при потоковой выгрузке
+STREAM_CHUNK_SIZE = 1000
+
+# Количество строк в одном multi-row INSERT: 1000 строк укладываются в лимит параметров PostgreSQL
+BULK_CHUNK_SIZE = 1000
+
+
+def chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Колонки, по которым строится keyset-пагинация (`page[after]`)
+    cursor_columns: Tuple[str, ...] = ("created_at", "id")
+
     def __init__(self, model: Type[ModelType], redis: Redis = None):
         """
             CRUD object with default methods to Create, Read, Update, Delete (CRUD).
@@ -26,39 +48,198 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self.redis = redis
         self.cache = Cache(db=self.redis)
 
+    def _apply_defaults(self, values: Dict[str, Any], *, onupdate: bool = False) -> Dict[str, Any]:
+        """Fill python-side column defaults: `databases` and multi-row INSERT don't execute them"""
+        for column in self.model.__table__.c:
+            default = column.onupdate if onupdate else column.default
+            if default is None or column.key in values:
+                continue
+            if default.is_callable:
+                values[column.key] = default.arg(None)
+            elif default.is_scalar:
+                values[column.key] = default.arg
+        return values
+
+    def _cache_dependencies(self, obj: Any) -> List[str]:
+        """Cache entities affected by a write of the object (model or dict of values):
+        the object itself and its parents, e.g. a comment changes the cached ticket"""
+        def value(key: str) -> Any:
+            return obj[key] if isinstance(obj, Mapping) else getattr(obj, key)
+
+        entity_keys = [self.cache.make_key(self.model.__tablename__, value("id"))]
+        for relation in inspect(self.model).relationships:
+            if relation.direction is not MANYTOONE:
+                continue
+            for local_column, _ in relation.local_remote_pairs:
+                parent_id = value(local_column.key)
+                if parent_id is not None:
+                    entity_keys.append(self.cache.make_key(relation.mapper.local_table.name, parent_id))
+        return entity_keys
+
+    async def _invalidate(self, objs: Sequence[Any]) -> None:
+        """Invalidate cache entries depending on the written objects and cached list pages of the model"""
+        if self.redis is None:
+            return
+        async with self.cache.batch() as batch:
+            batch.invalidate([key for obj in objs for key in self._cache_dependencies(obj)])
+            batch.bump_generation(self.model.__tablename__)
+
+    async def _fetch_one(self, db: Session, query: ClauseElement) -> Optional[Mapping[str, Any]]:
+        return db.execute(query).first()
+
+    async def _fetch_all(self, db: Session, query: ClauseElement) -> List[Mapping[str, Any]]:
+        return db.execute(query).fetchall()
+
+    async def _execute(self, db: Session, query: ClauseElement) -> None:
+        db.execute(query)
+        db.commit()
+
+    async def _iterate(self, db: Session, query: ClauseElement) -> AsyncIterator[Mapping[str, Any]]:
+        """Stream rows through a server-side cursor on a separate connection:
+        the response body is sent after the request session is closed.
+        Blocking reads run in the thread pool, one chunk per call"""
+        row_chunks = self._fetch_chunks(db, query)
+        try:
+            async for rows in iterate_in_threadpool(row_chunks):
+                for row in rows:
+                    yield row
+        finally:
+            # Клиент мог отключиться: курсор и соединение закрываются сразу, а не сборщиком мусора
+            await run_in_threadpool(row_chunks.close)
+
+    @staticmethod
+    def _fetch_chunks(db: Session, query: ClauseElement) -> Iterator[List[Mapping[str, Any]]]:
+        with db.get_bind().connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(query)
+            rows = result.fetchmany(STREAM_CHUNK_SIZE)
+            while rows:
+                yield rows
+                rows = result.fetchmany(STREAM_CHUNK_SIZE)
+
+    def _keyset(
+        self, after: Optional[str], columns: Sequence[str], descending: bool = False
+    ) -> Tuple[List[ClauseElement], List[Any]]:
+        """Build WHERE criteria and ORDER BY for the page after `after` cursor"""
+        keys = [getattr(self.model, name) for name in columns]
+        order_by = [key.desc() for key in keys] if descending else keys
+        if not after:
+            return [], order_by
+
+        # Курсор действителен только для порядка, в котором он выдан: значения другой колонки
+        # того же типа (`created_at` и `updated_at`) молча сдвинули бы страницу
+        values = decode_cursor(after)
+        if values[:1] != [self._cursor_order(columns, descending)] or len(values) != len(keys) + 1:
+            raise exceptions.InvalidCursor(after, "Invalid page cursor")
+        values = values[1:]
+
+        try:
+            bounds = tuple_(*[
+                literal(self._parse_cursor_value(key, value), key.type)
+                for key, value in zip(keys, values)
+            ])
+        except (TypeError, ValueError) as error:
+            raise exceptions.InvalidCursor(after, "Invalid page cursor") from error
+
+        if descending:
+            return [tuple_(*keys) < bounds], order_by
+        return [tuple_(*keys) > bounds], order_by
+
+    @staticmethod
+    def _parse_cursor_value(column: Any, value: Any) -> Any:
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if column.key == "id":
+            return UUID(value)
+        return value
+
+    @staticmethod
+    def _cursor_order(columns: Sequence[str], descending: bool) -> str:
+        """Sort order the cursor is issued for, e.g. `-updated_at,id`"""
+        return ('-' if descending else '') + ','.join(columns)
+
+    def _next_cursor(
+        self, items: Sequence[Any], limit: int, columns: Sequence[str], descending: bool = False
+    ) -> Optional[str]:
+        if len(items) < limit:
+            return None
+        return encode_cursor([self._cursor_order(columns, descending)] + [getattr(items[-1], name) for name in columns])
+
     async def get(self, db: Session, item_id: UUID) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == item_id).first()
 
-    async def list(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[ModelType]:
-        return db.query(self.model).offset(skip * limit).limit(limit).all()
+    async def list(
+        self, db: Session, *, skip: int = 0, limit: int = 100, filters: Sequence[Any] = (), order_by: Sequence[Any] = ()
+    ) -> List[ModelType]:
+        return db.query(self.model).filter(*filters).order_by(*order_by).offset(skip * limit).limit(limit).all()
+
+    async def list_after(
+        self,
+        db: Session,
+        *,
+        after: Optional[str] = None,
+        limit: int = 100,
+        filters: Sequence[Any] = (),
+        columns: Optional[Sequence[str]] = None,
+        descending: bool = False,
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        columns = columns or self.cursor_columns
+        criteria, order_by = self._keyset(after, columns, descending)
+        criteria.extend(filters)
+        items = db.query(self.model).filter(*criteria).order_by(*order_by).limit(limit).all()
+        return items, self._next_cursor(items, limit, columns, descending)
 
     async def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         db_obj = self.model(**obj_in.dict())       # type: ignore
         db.add(db_obj)
         db.commit()
-        db.refresh(db_obj)
+        await self._invalidate([db_obj])
         return db_obj
 
+    async def create_many(self, db: Session, *, objs_in: List[CreateSchemaType]) -> List[UUID]:
+        rows = [self._apply_defaults(obj_in.dict()) for obj_in in objs_in]
+        for chunk in chunks(rows, BULK_CHUNK_SIZE):
+            db.execute(self.model.__table__.insert().values(chunk))     # type: ignore
+        db.commit()
+        await self._invalidate(rows)
+        return [row["id"] for row in rows]
+
     async def update(
         self, db: Session, *, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
 
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data.get(field))
+        version = getattr(db_obj, "version", None)
+        for attr in inspect(db_obj).mapper.column_attrs:
+            if attr.key in update_data:
+                setattr(db_obj, attr.key, update_data.get(attr.key))
 
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        try:
+            db.commit()
+        except StaleDataError as error:
+            db.rollback()
+            raise self._version_mismatch(version) from error
+        await self._invalidate([db_obj])
         return db_obj
 
+    def _not_found(self, item_id: UUID) -> exceptions.ObjectNotFound:
+        name = self.model.__name__
+        return exceptions.ObjectNotFound(f"{name} Not Found", f"{name} {item_id} not found")
+
+    def _version_mismatch(self, version: Optional[int]) -> exceptions.PreconditionFailed:
+        """The versioned object was changed or deleted after it was read: the update affected no rows"""
+        return exceptions.PreconditionFailed(
+            "Version Mismatch", f"{self.model.__name__} has changed since version {version}",
+        )
+
     async def remove(self, db: Session, *, item_id: UUID) -> ModelType:
         remove_db_obj = db.query(self.model).get(item_id)
+        if remove_db_obj is None:
+            raise self._not_found(item_id)
         db.delete(remove_db_obj)
         db.commit()
+        await self._invalidate([remove_db_obj])
         return remove_db_obj
@@ -1,7 +1,10 @@
+import orjson
+
 from uuid import UUID
 from functools import lru_cache
 from fastapi import Depends
 from aioredis import Redis
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import (
     Optional,
@@ -9,15 +12,29 @@ from typing import (
     Union,
     Dict,
     Any,
+    Tuple,
 )
 
+from src.core.config.app_settings import AppSettings
 from src.db.redis import get_redis
 from src.core import exceptions
-from src.schemas import comment as comment_schema
+from src.core.events import publish_ticket_event
+from src.core.serializers import Serializer
+from src.schemas import comment as comment_schema, ticket as ticket_schema
 from src.models import comments as comment_model, tickets
+from src.services.crud.async_base import AsyncCRUDBase
 from src.services.crud.base import CRUDBase
 
 
+app_config = AppSettings()
+
+# Поток комментариев, принятых `create_queued` и ожидающих записи в базу (src/services/comment_queue.py)
+COMMENT_STREAM = 'queue:comments'
+
+# Данные событий `comment.created`
+comment_serializer = Serializer(comment_schema.Comment)
+
+
 class CommentService(CRUDBase[comment_model.Comment, comment_schema.CommentCreate, comment_schema.CommentUpdate]):
 
     async def get(self, db: Session, item_id: UUID) -> Optional[comment_model.Comment]:
@@ -32,6 +49,39 @@ class CommentService(CRUDBase[comment_model.Comment, comment_schema.CommentCreat
         """        
         return await super().get(db, item_id)
 
+    async def get_full(self, db: Session, item_id: UUID) -> Optional[comment_schema.CommentFull]:
+        """ Get comment by ID through the cache, missing comments are cached too
+
+        Args:
+            db (Session): SQLAlchemy Session
+            item_id (UUID): comment ID
+
+        Returns:
+            Optional[comment_schema.CommentFull]: Comment full data
+        """
+        comment_key = self.cache.make_key(self.model.__tablename__, item_id)
+
+        async def load(keys: List[str]) -> Dict[str, comment_schema.CommentFull]:
+            if app_config.comment_queue_enabled:
+                # Комментарий из очереди виден автору сразу. Ожидающая запись читается раньше базы:
+                # потребитель удаляет ее только после вставки, поэтому комментарий не пропадет между чтениями
+                pending = self.cache.serializer.loads(await self.cache.db.get(self.cache.make_pending_key(comment_key)))
+                if pending is not None:
+                    return {comment_key: comment_schema.CommentFull.parse_obj(pending)}
+
+            comment = await self.get(db, item_id)
+            return {comment_key: comment_schema.CommentFull.from_orm(comment)} if comment else {}
+
+        # Комментарий удаляется вместе с тикетом, поэтому запись сбрасывается и при изменении тикета
+        ticket_table_name = tickets.Ticket.__tablename__
+        comment, = await self.cache.get_or_load_many(
+            [comment_key],
+            comment_schema.CommentFull,
+            load,
+            dependencies=lambda comment: [self.cache.make_key(ticket_table_name, comment.ticket_id)],
+        )
+        return comment
+
     async def list(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[comment_model.Comment]:
         """[summary]
 
@@ -45,6 +95,24 @@ class CommentService(CRUDBase[comment_model.Comment, comment_schema.CommentCreat
         """        """  """
         return await super().list(db, skip=skip, limit=limit)
 
+    async def list_for_ticket(
+        self, db: Session, *, ticket_id: UUID, after: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[comment_model.Comment], Optional[str]]:
+        """ Page of ticket comments ordered by (created_at, id) after the cursor
+
+        Args:
+            db (Session): SQLAlchemy Session
+            ticket_id (UUID): ticket ID
+            after (Optional[str]): cursor of the previous page, empty for the first page
+            limit (int): page limit
+
+        Returns:
+            Tuple[List[comment_model.Comment], Optional[str]]: List of comments and cursor of the next page
+        """
+        return await super().list_after(
+            db, after=after, limit=limit, filters=[comment_model.Comment.ticket_id == ticket_id]
+        )
+
     async def create(self, db: Session, *, obj_in: comment_schema.CommentCreate) -> comment_model.Comment:
         """Create a new comment
 
@@ -55,15 +123,77 @@ class CommentService(CRUDBase[comment_model.Comment, comment_schema.CommentCreat
         Returns:
             comment_model.Comment: Comment full data
         """
-        ticket = db.query(tickets.Ticket).filter_by(id=obj_in.ticket_id).one()
+        ticket_table = tickets.Ticket.__table__
+        ticket = await self._fetch_one(
+            db, select([ticket_table.c.status]).where(ticket_table.c.id == obj_in.ticket_id)
+        )
+        self._check_ticket(obj_in.ticket_id, ticket["status"] if ticket else None)
+        comment = await super().create(db, obj_in=obj_in)
+        await publish_ticket_event(self.redis, 'comment.created', comment.ticket_id, comment_serializer.dump(comment))
+        return comment
+
+    async def create_queued(self, db: Session, *, obj_in: comment_schema.CommentCreate) -> comment_schema.CommentFull:
+        """Accept a comment for the asynchronous write: the ticket status is checked through the cache,
+        the comment is added to `COMMENT_STREAM` and written to the database by `consume_comments`
+
+        Args:
+            db (Session): SQLAlchemy Session
+            obj_in (comment_schema.CommentCreate): request parameters
+
+        Returns:
+            comment_schema.CommentFull: accepted comment with its generated ID
+        """
+        self._check_ticket(obj_in.ticket_id, await self.get_ticket_status(db, obj_in.ticket_id))
+
+        values = self._apply_defaults(obj_in.dict())
+        comment = comment_schema.CommentFull.parse_obj(values)
+        comment_key = self.cache.make_key(self.model.__tablename__, comment.id)
+
+        # Ожидающая запись и сообщение добавляются атомарно (MULTI/EXEC)
+        pipe = self.cache.db.pipeline(transaction=True)
+        pipe.set(
+            self.cache.make_pending_key(comment_key),
+            self.cache.serializer.dumps(comment.dict()),
+            ex=app_config.comment_queue_pending_ttl_seconds,
+        )
+        pipe.xadd(COMMENT_STREAM, {"comment": orjson.dumps(values)})     # pylint: disable=no-member
+        await pipe.execute()
+        return comment
+
+    async def get_ticket_status(self, db: Session, ticket_id: UUID) -> Optional[tickets.TicketStatus]:
+        """ Ticket status through the cache, the entry is invalidated by any write of the ticket
+
+        Args:
+            db (Session): SQLAlchemy Session
+            ticket_id (UUID): ticket ID
+
+        Returns:
+            Optional[tickets.TicketStatus]: ticket status, `None` if the ticket doesn't exist
+        """
+        ticket_table = tickets.Ticket.__table__
+        ticket_key = self.cache.make_key(ticket_table.name, ticket_id)
+        state_key = f'{ticket_key}:state'
+
+        async def load(keys: List[str]) -> Dict[str, ticket_schema.TicketState]:
+            ticket = await self._fetch_one(db, select([ticket_table.c.status]).where(ticket_table.c.id == ticket_id))
+            return {state_key: ticket_schema.TicketState(status=ticket["status"])} if ticket else {}
+
+        state, = await self.cache.get_or_load_many(
+            [state_key], ticket_schema.TicketState, load, dependencies=lambda state: [ticket_key],
+        )
+        return state.status if state else None
+
+    @staticmethod
+    def _check_ticket(ticket_id: UUID, status: Optional[tickets.TicketStatus]) -> None:
+        if status is None:
+            raise exceptions.ObjectNotFound("Ticket Not Found", f"Ticket {ticket_id} not found")
 
         # If ticket status is `Closed` comment won't create
-        if ticket.status == tickets.TicketStatus.CLOSED:
+        if status == tickets.TicketStatus.CLOSED:
             raise exceptions.TicketStatusNotAllowed(
                 "Ticket Status Not Allowed",
-                f"Comment Not Allowed in ticket status: {ticket.status.value}"
+                f"Comment Not Allowed in ticket status: {status.value}"
             )
-        return await super().create(db, obj_in=obj_in)
 
     async def update(
         self, db: Session, *, db_obj: comment_model.Comment, obj_in: Union[comment_schema.CommentUpdate, Dict[str, Any]]
@@ -93,11 +223,19 @@ class CommentService(CRUDBase[comment_model.Comment, comment_schema.CommentCreat
         return await super().remove(db, item_id=item_id)
 
 
+class AsyncCommentService(
+    CommentService,
+    AsyncCRUDBase[comment_model.Comment, comment_schema.CommentCreate, comment_schema.CommentUpdate],
+):
+    """CommentService on top of the `databases` connection pool"""
+
+
 @lru_cache
 def get_comment_service(
     redis: Redis = Depends(get_redis),
 ) -> CommentService:
-    return CommentService(
+    service_class = AsyncCommentService if app_config.db.async_crud else CommentService
+    return service_class(
         comment_model.Comment,
         redis=redis,
     )
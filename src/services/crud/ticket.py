@@ -1,9 +1,12 @@
-from src.models.history_meta import versioned_session
+from datetime import datetime, timezone
+
+import orjson
 from uuid import UUID
 from functools import lru_cache
 from fastapi import Depends
-from fastapi.encoders import jsonable_encoder
 from aioredis import Redis
+from sqlalchemy import JSON, BigInteger, and_, cast, func, literal, literal_column, select, text, true, union_all
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from typing import (
     Optional,
@@ -11,48 +14,554 @@ from typing import (
     Union,
     Dict,
     Any,
+    Tuple,
+    AsyncIterator,
 )
 
+from src.core.config.app_settings import AppSettings
 from src.db.redis import get_redis
 from src.core import exceptions
+from src.core.events import publish_ticket_event
+from src.core.modules import encode_cursor, decode_cursor, make_etag
+from src.core.serializers import Serializer
 from src.schemas import ticket as ticket_schema
-from src.models import tickets as ticket_model
+from src.models import tickets as ticket_model, comments as comment_model
+from src.services.crud.async_base import AsyncCRUDBase
 from src.services.crud.base import CRUDBase
 
 
+app_config = AppSettings()
+
+# Вес совпадения в комментарии относительно совпадения в самом тикете
+COMMENT_RANK_WEIGHT = 0.5
+
+# Элементы страниц списка в кэше и данные событий `ticket.updated`
+ticket_serializer = Serializer(ticket_schema.Ticket)
+
+
 class TicketService(CRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ticket_schema.TicketUpdate]):
 
     async def get(self, db: Session, item_id: UUID) -> Optional[ticket_model.Ticket]:
-        """ Get ticket by ID
+        """ Get ticket model by ID, used by write operations
 
         Args:
             db (Session): SQLAlchemy Session
             item_id (UUID): ticket ID
 
         Returns:
-            Optional[ticket_model.Ticket]: Ticket full data
+            Optional[ticket_model.Ticket]: Ticket model
         """
-        ticket = await self.cache.get_from_cache(obj_id=str(item_id), obj_model=ticket_schema.Comment)
+        return await super().get(db, item_id)
+
+    async def get_full(self, db: Session, item_id: UUID) -> Optional[ticket_schema.TicketFull]:
+        """ Get ticket full data by ID through the cache
+
+        Args:
+            db (Session): SQLAlchemy Session
+            item_id (UUID): ticket ID
+
+        Returns:
+            Optional[ticket_schema.TicketFull]: Ticket full data
+        """
+        tickets = await self.get_many_full(db, [item_id])
+        return tickets[0] if tickets else None
+
+    async def get_full_response(self, db: Session, item_id: UUID) -> Optional[Tuple[str, bytes]]:
+        """ Ticket full data as ready JSON bytes with its ETag. On a cache hit neither
+        decoding nor pydantic validation runs, the bytes go to the response as is
+
+        Args:
+            db (Session): SQLAlchemy Session
+            item_id (UUID): ticket ID
+
+        Returns:
+            Optional[Tuple[str, bytes]]: ETag and `TicketFull` JSON
+        """
+        raw_key = self.cache.make_raw_key(self.cache.make_key(self.model.__tablename__, item_id))
+        raw = await self.cache.get_raw(raw_key)
+        if raw:
+            etag, body = raw.split(b'\n', 1)
+            return etag.decode(), body
+
+        # Время до чтения: байты не записываются, если тикет или его комментарии изменились за время загрузки
+        since = await self.cache.now()
+        ticket = await self.get_full(db, item_id)
         if not ticket:
-            ticket = await super().get(db, item_id)
+            return None
 
-            if ticket:
-                await self.cache.put_to_cache(obj_model=ticket)
+        etag = self.etag(ticket)
+        # Тот же JSON, что FastAPI отдает для `response_model=TicketFull`: по алиасам полей
+        body = orjson.dumps(ticket.dict(by_alias=True))        # pylint: disable=no-member
+        async with self.cache.batch() as batch:
+            batch.set_raw(
+                raw_key, etag.encode() + b'\n' + body, dependencies=self._full_dependencies(ticket), since=since,
+            )
+        return etag, body
 
-        return ticket
+    async def get_many_full(self, db: Session, items_ids: List[UUID]) -> List[ticket_schema.TicketFull]:
+        """ Get many tickets with a constant number of round trips:
+        one MGET, one query for tickets with comments and one pipeline to fill the cache.
+        Concurrent misses of the same ticket are loaded once, see `Cache.get_or_load_many`
+
+        Args:
+            db (Session): SQLAlchemy Session
+            items_ids (List[UUID]): tickets IDs
+
+        Returns:
+            List[ticket_schema.TicketFull]: found tickets in the order of IDs
+        """
+        table_name = self.model.__tablename__
+        ids_by_key = {self.cache.make_key(table_name, item_id): item_id for item_id in items_ids}
+
+        async def load(keys: List[str]) -> Dict[str, ticket_schema.TicketFull]:
+            loaded = await self._load_full(db, [ids_by_key[key] for key in keys])
+            return {self.cache.make_key(table_name, ticket.id): ticket for ticket in loaded}
+
+        tickets = await self.cache.get_or_load_many(
+            list(ids_by_key), ticket_schema.TicketFull, load, dependencies=self._full_dependencies,
+        )
+        return [ticket for ticket in tickets if ticket]
+
+    @staticmethod
+    def etag(ticket: ticket_schema.TicketFull) -> str:
+        """ETag of the ticket: the version plus comments, they change without a new ticket version"""
+        latest_comment = ticket.comment[0].id if ticket.comment else None
+        return make_etag(ticket.id, ticket.version, ticket.comments_count, latest_comment)
+
+    def _full_dependencies(self, ticket: ticket_schema.TicketFull) -> List[str]:
+        """Entities the cached full ticket is built from: the ticket and its embedded comments.
+        New comments invalidate the ticket through `CRUDBase._cache_dependencies` of the comment"""
+        comment_table_name = comment_model.Comment.__tablename__
+        return [self.cache.make_key(self.model.__tablename__, ticket.id)] + [
+            self.cache.make_key(comment_table_name, comment.id) for comment in ticket.comment
+        ]
+
+    async def _load_full(self, db: Session, items_ids: List[UUID]) -> List[ticket_schema.TicketFull]:
+        """Load tickets with the latest comments and comments count in a single query"""
+        ticket_table = self.model.__table__
+
+        latest, comments, comments_count = self._comments_preview(ticket_table.c.id)
+        query = (
+            select([ticket_table, comments.label('comments'), comments_count.label('comments_count')])
+            .select_from(ticket_table.outerjoin(latest, true()))
+            .where(ticket_table.c.id.in_(items_ids))
+            .group_by(ticket_table.c.id)
+        )
 
-    async def list(self, db: Session, *, skip: int = 0, limit: int = 100) -> List[ticket_model.Ticket]:
+        rows = await self._fetch_all(db, query)
+        return [ticket_schema.TicketFull.parse_obj(dict(row)) for row in rows]
+
+    @staticmethod
+    def _comments_preview(ticket_id: Any, as_of: Optional[datetime] = None) -> Tuple[Any, Any, Any]:
+        """LATERAL subquery with the latest comments, their JSON aggregate and comments count"""
+        comment_table = comment_model.Comment.__table__
+        criteria = [comment_table.c.ticket_id == ticket_id]
+        if as_of:
+            criteria.append(comment_table.c.created_at <= as_of)
+
+        latest = (
+            select([comment_table])
+            .where(and_(*criteria))
+            .order_by(comment_table.c.created_at.desc(), comment_table.c.id.desc())
+            .limit(app_config.ticket_comments_limit)
+            .lateral('latest')
+        )
+        # Агрегат с ORDER BY задан текстом: `databases` строит имена колонок результата
+        # через `str()` выражения, а строковый компилятор не знает `aggregate_order_by`
+        comments = literal_column(
+            "coalesce(json_agg(latest ORDER BY latest.created_at DESC, latest.id DESC) "
+            "FILTER (WHERE latest.id IS NOT NULL), '[]'::json)",
+            type_=JSON,
+        )
+        comments_count = select([func.count()]).where(and_(*criteria)).as_scalar()
+        return latest, comments, comments_count
+
+    async def get_as_of(self, db: Session, item_id: UUID, as_of: datetime) -> Optional[ticket_schema.TicketFull]:
+        """ Ticket state at the moment `as_of` rebuilt from the history table.
+        Comments are filtered by creation time, deleted comments are not restored.
+
+        Args:
+            db (Session): SQLAlchemy Session
+            item_id (UUID): ticket ID
+            as_of (datetime): moment in UTC
+
+        Returns:
+            Optional[ticket_schema.TicketFull]: Ticket full data at that moment
+        """
+        history_table = self.model.__history_mapper__.local_table       # type: ignore
+        ticket_table = self.model.__table__
+        if as_of.tzinfo:
+            # даты в БД хранятся в UTC без часового пояса
+            as_of = as_of.astimezone(timezone.utc).replace(tzinfo=None)
+
+        # Строка истории хранит состояние до изменения в момент `changed`, поэтому состоянием
+        # на момент `as_of` будет первая строка, измененная позже `as_of`, а если таких нет - текущая
+        state = await self._fetch_one(
+            db,
+            history_table.select()
+            .where(and_(history_table.c.id == item_id, history_table.c.changed > as_of))
+            .order_by(history_table.c.changed)
+            .limit(1),
+        )
+        if not state:
+            state = await self._fetch_one(db, ticket_table.select().where(ticket_table.c.id == item_id))
+
+        if not state or state["created_at"] > as_of:
+            return None
+
+        latest, comments, comments_count = self._comments_preview(
+            literal(item_id, ticket_table.c.id.type), as_of,
+        )
+        preview = await self._fetch_one(
+            db, select([comments.label('comments'), comments_count.label('comments_count')]).select_from(latest),
+        )
+        return ticket_schema.TicketFull.parse_obj({**dict(state), **dict(preview)})
+
+    async def history(
+        self, db: Session, *, item_id: UUID, after: Optional[str] = None, limit: int = 100
+    ) -> Tuple[List[ticket_schema.TicketHistory], Optional[str]]:
+        """ Page of ticket versions ordered by version after the cursor
+
+        Args:
+            db (Session): SQLAlchemy Session
+            item_id (UUID): ticket ID
+            after (Optional[str]): cursor of the previous page, empty for the first page
+            limit (int): page limit
+
+        Returns:
+            Tuple[List[ticket_schema.TicketHistory], Optional[str]]: versions and cursor of the next page
+        """
+        history_table = self.model.__history_mapper__.local_table       # type: ignore
+        query = (
+            history_table.select()
+            .where(history_table.c.id == item_id)
+            .order_by(history_table.c.version)
+            .limit(limit)
+        )
+        if after:
+            values = decode_cursor(after)
+            if len(values) != 1 or not isinstance(values[0], int):
+                raise exceptions.InvalidCursor(after, "Invalid page cursor")
+            query = query.where(history_table.c.version > values[0])
+
+        rows = await self._fetch_all(db, query)
+        versions = [ticket_schema.TicketHistory.parse_obj(dict(row)) for row in rows]
+        next_cursor = encode_cursor([versions[-1].version]) if len(versions) == limit else None
+        return versions, next_cursor
+
+    async def list(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        ticket_filter: Optional[ticket_schema.TicketFilter] = None,
+    ) -> List[ticket_model.Ticket]:
         """ List of tickets
 
         Args:
             db (Session): SQLAlchemy Session
             skip (int): page number
             limit (int): page limit
+            ticket_filter (Optional[ticket_schema.TicketFilter]): filters and sort order
 
         Returns:
             List[ticket_model.Ticket]: List of tickets
-        """        """  """
-        return await super().list(db, skip=skip, limit=limit)
+        """
+        if not ticket_filter:
+            return await super().list(db, skip=skip, limit=limit)
+
+        column = getattr(self.model, ticket_filter.sort.column)
+        order_by = [column.desc(), self.model.id.desc()] if ticket_filter.sort.descending else [column, self.model.id]
+        return await super().list(
+            db, skip=skip, limit=limit, filters=self._filter_criteria(ticket_filter), order_by=order_by,
+        )
+
+    async def list_after(
+        self,
+        db: Session,
+        *,
+        after: Optional[str] = None,
+        limit: int = 100,
+        ticket_filter: Optional[ticket_schema.TicketFilter] = None,
+    ) -> Tuple[List[ticket_model.Ticket], Optional[str]]:
+        """ Page of tickets ordered by (<sort column>, id) after the cursor
+
+        Args:
+            db (Session): SQLAlchemy Session
+            after (Optional[str]): cursor of the previous page, empty for the first page
+            limit (int): page limit
+            ticket_filter (Optional[ticket_schema.TicketFilter]): filters and sort order
+
+        Returns:
+            Tuple[List[ticket_model.Ticket], Optional[str]]: List of tickets and cursor of the next page
+        """
+        if not ticket_filter:
+            return await super().list_after(db, after=after, limit=limit)
+
+        return await super().list_after(
+            db,
+            after=after,
+            limit=limit,
+            filters=self._filter_criteria(ticket_filter),
+            columns=(ticket_filter.sort.column, "id"),
+            descending=ticket_filter.sort.descending,
+        )
+
+    async def list_page(
+        self,
+        db: Session,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        ticket_filter: Optional[ticket_schema.TicketFilter] = None,
+    ) -> ticket_schema.TicketPage:
+        """ Page of tickets through the cache: `list_after` when `after` is set, otherwise `list`.
+        Pages are cached under the current generation of `tickets`, any ticket write makes them stale
+
+        Args:
+            db (Session): SQLAlchemy Session
+            skip (int): page number
+            limit (int): page limit
+            after (Optional[str]): cursor of the previous page, empty for the first page
+            ticket_filter (Optional[ticket_schema.TicketFilter]): filters and sort order
+
+        Returns:
+            ticket_schema.TicketPage: tickets and cursor of the next page
+        """
+        table_name = self.model.__tablename__
+        generation = await self.cache.get_generation(table_name)
+        page_key = self.cache.make_list_key(table_name, generation, self._list_params(skip, limit, after, ticket_filter))
+
+        async def load(keys: List[str]) -> Dict[str, ticket_schema.TicketPage]:
+            if after is not None:
+                items, next_cursor = await self.list_after(db, after=after, limit=limit, ticket_filter=ticket_filter)
+            else:
+                items, next_cursor = await self.list(db, skip=skip, limit=limit, ticket_filter=ticket_filter), None
+            page = ticket_schema.TicketPage(items=ticket_serializer.dump_many(items), next_cursor=next_cursor)
+            return {page_key: page}
+
+        page, = await self.cache.get_or_load_many(
+            [page_key], ticket_schema.TicketPage, load, expire=app_config.redis_db.CACHE_LIST_EXPIRE_IN_SECONDS,
+        )
+        return page
+
+    @staticmethod
+    def _list_params(
+        skip: int, limit: int, after: Optional[str], ticket_filter: Optional[ticket_schema.TicketFilter]
+    ) -> Dict[str, Any]:
+        """Parameters that identify a cached list page"""
+        params: Dict[str, Any] = {"skip": skip, "limit": limit, "after": after}
+        if ticket_filter:
+            params.update(
+                status=sorted(status.value for status in ticket_filter.status or ()),
+                active=ticket_filter.active,
+                email=ticket_filter.email,
+                created_by=ticket_filter.created_by,
+                created_from=ticket_filter.created_from,
+                created_to=ticket_filter.created_to,
+                updated_from=ticket_filter.updated_from,
+                updated_to=ticket_filter.updated_to,
+                sort=ticket_filter.sort.value,
+            )
+        return params
+
+    def export_fields(self, include_comments: bool = False) -> List[str]:
+        """Fields of exported rows in the order of columns"""
+        fields = [column.key for column in self.model.__table__.c]
+        return fields + ['comments'] if include_comments else fields
+
+    async def export(
+        self,
+        db: Session,
+        *,
+        ticket_filter: Optional[ticket_schema.TicketFilter] = None,
+        include_comments: bool = False,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """ Stream all tickets matching the filter through a server-side cursor
+
+        Args:
+            db (Session): SQLAlchemy Session
+            ticket_filter (Optional[ticket_schema.TicketFilter]): filters and sort order
+            include_comments (bool): add all comments of a ticket as a JSON array
+
+        Returns:
+            AsyncIterator[Dict[str, Any]]: ticket rows
+        """
+        ticket_table = self.model.__table__
+        columns: List[Any] = list(ticket_table.c)
+        if include_comments:
+            comment_table = comment_model.Comment.__table__.alias('c')
+            # Агрегат с ORDER BY задан текстом, как в `_comments_preview`: его компилирует и `databases`
+            columns.append(
+                select([literal_column("coalesce(json_agg(c ORDER BY c.created_at, c.id), '[]'::json)", type_=JSON)])
+                .select_from(comment_table)
+                .where(comment_table.c.ticket_id == ticket_table.c.id)
+                .as_scalar()
+                .label('comments')
+            )
+
+        query = select(columns)
+        order_by = [ticket_table.c.created_at, ticket_table.c.id]
+        if ticket_filter:
+            for criterion in self._filter_criteria(ticket_filter):
+                query = query.where(criterion)
+            column = ticket_table.c[ticket_filter.sort.column]
+            order_by = [column.desc(), ticket_table.c.id.desc()] if ticket_filter.sort.descending else [column, ticket_table.c.id]
+
+        async for row in self._iterate(db, query.order_by(*order_by)):
+            # Ключи строки могут быть `quoted_name`, orjson принимает только `str`
+            yield {str(key): value for key, value in row.items()}
+
+    async def search(
+        self, db: Session, *, query: str, skip: int = 0, limit: int = 100
+    ) -> List[ticket_schema.TicketSearchResult]:
+        """ Full-text search over ticket title/description and comments body
+
+        Args:
+            db (Session): SQLAlchemy Session
+            query (str): search query in `websearch_to_tsquery` syntax
+            skip (int): page number
+            limit (int): page limit
+
+        Returns:
+            List[ticket_schema.TicketSearchResult]: tickets ordered by rank
+        """
+        ticket_table = self.model.__table__
+        comment_table = comment_model.Comment.__table__
+        tsquery = func.websearch_to_tsquery(ticket_model.SEARCH_CONFIG, query)
+
+        # Совпадения ищутся по GIN-индексам обеих таблиц, совпадение в комментарии весит меньше.
+        # Каждая ветка ограничена глубиной запрошенной страницы до объединения: тикет из первых N
+        # по максимальному рангу входит в первые N своей ветки, поэтому сортируются только N строк веток
+        depth = (skip + 1) * limit
+        ticket_rank = func.ts_rank_cd(ticket_model.ticket_search_vector, tsquery)
+        ticket_matches = (
+            select([ticket_table.c.id.label('ticket_id'), ticket_rank.label('rank')])
+            .where(ticket_model.ticket_search_vector.op('@@')(tsquery))
+            .order_by(ticket_rank.desc(), ticket_table.c.id)
+            .limit(depth)
+            .alias('ticket_matches')
+        )
+        comment_rank = func.max(func.ts_rank_cd(ticket_model.comment_search_vector, tsquery)) * COMMENT_RANK_WEIGHT
+        comment_matches = (
+            select([comment_table.c.ticket_id, comment_rank.label('rank')])
+            .where(ticket_model.comment_search_vector.op('@@')(tsquery))
+            .group_by(comment_table.c.ticket_id)
+            .order_by(comment_rank.desc(), comment_table.c.ticket_id)
+            .limit(depth)
+            .alias('comment_matches')
+        )
+        matches = union_all(
+            select([ticket_matches.c.ticket_id, ticket_matches.c.rank]),
+            select([comment_matches.c.ticket_id, comment_matches.c.rank]),
+        ).alias('matches')
+        ranked = (
+            select([matches.c.ticket_id, func.max(matches.c.rank).label('rank')])
+            .group_by(matches.c.ticket_id)
+            .order_by(func.max(matches.c.rank).desc(), matches.c.ticket_id)
+            .offset(skip * limit)
+            .limit(limit)
+            .alias('ranked')
+        )
+        rows = await self._fetch_all(
+            db,
+            select([ticket_table, ranked.c.rank])
+            .select_from(ticket_table.join(ranked, ticket_table.c.id == ranked.c.ticket_id))
+            .order_by(ranked.c.rank.desc(), ranked.c.ticket_id),
+        )
+        return [ticket_schema.TicketSearchResult.parse_obj(dict(row)) for row in rows]
+
+    async def get_stats(self, db: Session) -> ticket_schema.TicketStats:
+        """ Number of tickets by status from the counters table
+
+        Args:
+            db (Session): SQLAlchemy Session
+
+        Returns:
+            ticket_schema.TicketStats: counters by status
+        """
+        counter_table = ticket_model.TicketCounter.__table__
+        rows = await self._fetch_all(
+            db,
+            select([counter_table.c.status, cast(func.sum(counter_table.c.count), BigInteger).label("count")])
+            .group_by(counter_table.c.status),
+        )
+        counters = {row["status"].value: row["count"] for row in rows}
+        return ticket_schema.TicketStats(total=sum(counters.values()), **counters)
+
+    async def reconcile_stats(self, db: Session) -> Dict[str, int]:
+        """ Recount tickets by status and repair the counters table without blocking writers.
+        Tickets and counters are read from one snapshot: triggers change counters in the same
+        transaction as tickets, so their difference in the snapshot is the drift. The drift is added
+        to the counters, not assigned, and changes committed after the snapshot are kept.
+
+        Args:
+            db (Session): SQLAlchemy Session
+
+        Returns:
+            Dict[str, int]: drift by status that was repaired
+        """
+        counter_table = ticket_model.TicketCounter.__table__
+        try:
+            db.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"))
+            actual = {
+                row["status"]: row["count"]
+                for row in db.execute(
+                    select([self.model.status, func.count().label("count")]).group_by(self.model.status)
+                ).fetchall()
+            }
+            stored = {
+                row["status"]: row["count"]
+                for row in db.execute(
+                    select([counter_table.c.status, func.sum(counter_table.c.count).label("count")])
+                    .group_by(counter_table.c.status)
+                ).fetchall()
+            }
+            db.commit()
+
+            drift = {}
+            for status in ticket_model.TicketStatus:
+                delta = actual.get(status, 0) - stored.get(status, 0)
+                if delta:
+                    drift[status.value] = int(delta)
+                    statement = insert(counter_table).values(status=status, shard=0, count=delta)
+                    db.execute(statement.on_conflict_do_update(
+                        index_elements=["status", "shard"], set_={"count": counter_table.c.count + statement.excluded.count},
+                    ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        return drift
+
+    def _filter_criteria(self, ticket_filter: ticket_schema.TicketFilter) -> List[Any]:
+        # Условия совпадают с индексами из миграции `tickets filter indexes`,
+        # в частности `filter[active]` - с предикатом частичного индекса `status <> 'CLOSED'`
+        criteria = []
+        if ticket_filter.status:
+            criteria.append(self.model.status.in_(ticket_filter.status))
+        if ticket_filter.active is not None:
+            if ticket_filter.active:
+                # Литерал, а не параметр: иначе обобщенный план asyncpg не сопоставится с частичным индексом
+                criteria.append(self.model.status != literal_column(f"'{ticket_model.TicketStatus.CLOSED.name}'"))
+            else:
+                criteria.append(self.model.status == ticket_model.TicketStatus.CLOSED)
+        if ticket_filter.email:
+            criteria.append(self.model.email == ticket_filter.email)
+        if ticket_filter.created_by:
+            criteria.append(self.model.created_by == ticket_filter.created_by)
+        if ticket_filter.created_from:
+            criteria.append(self.model.created_at >= ticket_filter.created_from)
+        if ticket_filter.created_to:
+            criteria.append(self.model.created_at < ticket_filter.created_to)
+        if ticket_filter.updated_from:
+            criteria.append(self.model.updated_at >= ticket_filter.updated_from)
+        if ticket_filter.updated_to:
+            criteria.append(self.model.updated_at < ticket_filter.updated_to)
+        return criteria
 
     async def create(self, db: Session, *, obj_in: ticket_schema.TicketCreate) -> ticket_model.Ticket:
         """Create a ticket
@@ -64,19 +573,30 @@ class TicketService(CRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ti
         Returns:
             ticket_model.Ticket: Ticket full data
         """     
-        versioned_session(db)
-        data_in_obj = jsonable_encoder(obj_in)
-        db_obj = ticket_model.Ticket(**data_in_obj)
-        db_obj.status = obj_in.status
+        return await super().create(db, obj_in=obj_in)
+
+    async def create_many(self, db: Session, *, objs_in: List[ticket_schema.TicketCreate]) -> List[UUID]:
+        """Create tickets with multi-row INSERTs in a single transaction
 
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        Args:
+            db (Session): SQLAlchemy Session
+            objs_in (List[ticket_schema.TicketCreate]): validated tickets
+
+        Returns:
+            List[UUID]: IDs of created tickets in the same order
+        """
+        if not objs_in:
+            return []
 
-        return db_obj
+        return await super().create_many(db, objs_in=objs_in)
 
     async def update(
-        self, db: Session, *, db_obj: ticket_model.Ticket, obj_in: Union[ticket_schema.TicketUpdate, Dict[str, Any]]
+        self,
+        db: Session,
+        *,
+        db_obj: ticket_model.Ticket,
+        obj_in: Union[ticket_schema.TicketUpdate, Dict[str, Any]],
+        expected_version: Optional[int] = None,
     ) -> ticket_model.Ticket:
         """[summary]
 
@@ -84,11 +604,19 @@ class TicketService(CRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ti
             db (Session): SQLAlchemy Session
             db_obj (ticket_model.Ticket): Database model of Ticket
             obj_in (Union[ticket_schema.TicketUpdate, Dict[str, Any]]): request parameters
+            expected_version (Optional[int]): version from `If-Match`, the update fails if the ticket has changed.
+                The UPDATE itself is conditional on the version of `db_obj`, so a concurrent change
+                between the read and the write fails with `PreconditionFailed` too
 
         Returns:
             ticket_model.Ticket: Ticket full data
         """
-        versioned_session(db)
+        if expected_version is not None and db_obj.version != expected_version:
+            raise exceptions.PreconditionFailed(
+                "Version Mismatch",
+                f"Ticket version is {db_obj.version}, expected {expected_version}",
+            )
+
         transactions_task = ticket_schema.TransactionStatus()
         ticket = None
         if type(obj_in) == dict:
@@ -109,7 +637,7 @@ class TicketService(CRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ti
                 ticket = await super().update(db, db_obj=db_obj, obj_in=obj_in)
 
         if ticket:
-            await self.cache.delete_from_cache(obj_id=str(ticket.id))
+            await publish_ticket_event(self.redis, 'ticket.updated', ticket.id, ticket_serializer.dump(ticket))
             return ticket
 
         raise exceptions.TicketStatusNotAllowed(
@@ -128,16 +656,23 @@ class TicketService(CRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ti
             ticket_model.Ticket: Ticket full data
         """        
         ticket = await super().remove(db, item_id=item_id)
-        await self.cache.delete_from_cache(obj_id=str(ticket.id))
-
+        await publish_ticket_event(self.redis, 'ticket.removed', item_id, {"id": item_id})
         return ticket
 
 
+class AsyncTicketService(
+    TicketService,
+    AsyncCRUDBase[ticket_model.Ticket, ticket_schema.TicketCreate, ticket_schema.TicketUpdate],
+):
+    """TicketService on top of the `databases` connection pool"""
+
+
 @lru_cache
 def get_ticket_service(
     redis: Redis = Depends(get_redis),
 ) -> TicketService:
-    return TicketService(
+    service_class = AsyncTicketService if app_config.db.async_crud else TicketService
+    return service_class(
         ticket_model.Ticket,
         redis=redis,
     )
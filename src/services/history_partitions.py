@@ -0,0 +1,153 @@
+import os
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.models import tickets as ticket_model
+
+
+HISTORY_TABLE = ticket_model.Ticket.__history_mapper__.local_table.name      # pylint: disable=no-member
+DEFAULT_PARTITION = f'{HISTORY_TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{HISTORY_TABLE}_(\d{{4}})_(\d{{2}})$')
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return datetime.utcnow().date().replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f'{HISTORY_TABLE}_{month:%Y_%m}'
+
+
+def monthly_tables(names: List[str]) -> Dict[date, str]:
+    """Tables named `<history table>_YYYY_MM` by the first day of the month"""
+    tables = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            tables[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return tables
+
+
+def list_partitions(db: Session) -> Dict[date, str]:
+    """Monthly partitions of the history table by the first day of the month"""
+    rows = db.execute(
+        text(
+            """
+            SELECT c.relname AS name
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:parent AS regclass)
+            """
+        ),
+        {"parent": HISTORY_TABLE},
+    ).fetchall()
+    return monthly_tables([row["name"] for row in rows])
+
+
+def list_detached_partitions(db: Session) -> Dict[date, str]:
+    """Monthly tables of the history table that are not attached: detached by `archive_partitions`
+    without `export_dir`, they are exported and dropped by a later run with `export_dir`"""
+    rows = db.execute(
+        text(
+            """
+            SELECT c.relname AS name
+            FROM pg_class c
+            WHERE c.relkind = 'r' AND c.relname LIKE :prefix AND pg_table_is_visible(c.oid)
+                AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+            """
+        ),
+        {"prefix": f"{HISTORY_TABLE}\\_%"},
+    ).fetchall()
+    return monthly_tables([row["name"] for row in rows])
+
+
+def create_partitions(db: Session, months_ahead: int) -> List[str]:
+    """Create partitions from the current month to `months_ahead` months forward.
+
+    Rows that already got into the default partition for that month are moved
+    into the new partition, otherwise PostgreSQL refuses to attach it.
+    """
+    existing = list_partitions(db)
+    created = []
+    for offset in range(months_ahead + 1):
+        start = add_months(current_month(), offset)
+        if start in existing:
+            continue
+
+        end = add_months(start, 1)
+        name = partition_name(start)
+        try:
+            db.execute(text(f'CREATE TABLE {name} (LIKE {HISTORY_TABLE} INCLUDING DEFAULTS)'))
+            db.execute(
+                text(
+                    f"""
+                    WITH moved AS (
+                        DELETE FROM {DEFAULT_PARTITION} WHERE changed >= :start AND changed < :end RETURNING *
+                    )
+                    INSERT INTO {name} SELECT * FROM moved
+                    """
+                ),
+                {"start": start, "end": end},
+            )
+            db.execute(
+                text(f"ALTER TABLE {HISTORY_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        created.append(name)
+    return created
+
+
+def export_table(db: Session, name: str, path: str) -> None:
+    """Write the table to a CSV file, the file appears only when it is complete"""
+    tmp_path = f'{path}.tmp'
+    cursor = db.connection().connection.cursor()
+    with open(tmp_path, 'w') as export_file:
+        cursor.copy_expert(f'COPY {name} TO STDOUT WITH CSV HEADER', export_file)
+        export_file.flush()
+        os.fsync(export_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def archive_partitions(db: Session, retention_months: int, export_dir: Optional[str] = None) -> List[str]:
+    """Archive partitions older than `retention_months`.
+
+    With `export_dir` a partition is exported to `<export_dir>/<partition>.csv` while it is
+    still attached and dropped only after the file is written: a failed run changes nothing
+    and is repeated as is. Tables detached by earlier runs without `export_dir` are exported
+    and dropped too. Without `export_dir` partitions are detached and left as standalone tables.
+    """
+    cutoff = add_months(current_month(), -retention_months)
+    expired = list_partitions(db)
+    if export_dir:
+        expired.update(list_detached_partitions(db))
+
+    archived = []
+    for start, name in sorted(expired.items()):
+        if add_months(start, 1) > cutoff:
+            continue
+
+        try:
+            if export_dir:
+                export_table(db, name, os.path.join(export_dir, f'{name}.csv'))
+                db.execute(text(f'DROP TABLE {name}'))
+            else:
+                db.execute(text(f'ALTER TABLE {HISTORY_TABLE} DETACH PARTITION {name}'))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        archived.append(name)
+    return archived
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from pathlib import Path
+from urllib.parse import urlparse
+
+# Настройки читаются при импорте модулей приложения, поэтому задаются до импорта `src`.
+# Тесты пересоздают базу `DATABASE_PG_DSN` и очищают Redis: нужны отдельные тестовые экземпляры
+os.environ.setdefault("DATABASE_PG_DSN", "postgresql://postgres@127.0.0.1:5432/tickets_test")
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+
+import aioredis                                     # noqa: E402
+import psycopg2                                     # noqa: E402
+import pytest                                       # noqa: E402
+from alembic import command                         # noqa: E402
+from alembic.config import Config                   # noqa: E402
+from fastapi.testclient import TestClient           # noqa: E402
+
+from src import main                                # noqa: E402
+from src.db import postgresql, redis                # noqa: E402
+from src.services.crud import comment as comment_service, ticket as ticket_service     # noqa: E402
+
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKENDS = ("session", "async")
+
+
+def recreate_database(dsn: str) -> None:
+    url = urlparse(dsn)
+    connection = psycopg2.connect(dsn.replace(url.path, "/postgres"))
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{url.path[1:]}"')
+        cursor.execute(f'CREATE DATABASE "{url.path[1:]}"')
+    connection.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    recreate_database(os.environ["DATABASE_PG_DSN"])
+    config = Config(str(ROOT / "src" / "models" / "alembic.ini"))
+    config.set_main_option("script_location", str(ROOT / "src" / "models" / "migrations"))
+    command.upgrade(config, "head")
+    yield
+    postgresql.engine.dispose()
+
+
+def clean_database() -> None:
+    with postgresql.engine.begin() as connection:
+        connection.execute("TRUNCATE tickets, comments, tickets_history CASCADE")
+        connection.execute("DELETE FROM ticket_counters")
+
+
+async def flush_redis() -> None:
+    client = aioredis.from_url(f"redis://{os.environ['REDIS_HOST']}:{os.environ['REDIS_PORT']}/0")
+    await client.flushdb()
+    await client.close()
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    """Every test using the app runs with the `Session` and with the `databases` CRUD"""
+    for module in (main, ticket_service, comment_service):
+        monkeypatch.setattr(module.app_config.db, "async_crud", request.param == "async")
+    ticket_service.get_ticket_service.cache_clear()
+    comment_service.get_comment_service.cache_clear()
+    clean_database()
+    # TestClient выполняет приложение в текущем цикле событий, тест получает новый
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(flush_redis())
+    yield request.param
+    loop.close()
+
+
+@pytest.fixture
+def client(backend):
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def run(client):
+    """Run a coroutine in the event loop of the app, e.g. to call services directly"""
+    return asyncio.get_event_loop().run_until_complete
+
+
+@pytest.fixture
+def db(client, backend):
+    if backend == "async":
+        yield postgresql.database
+        return
+
+    session = postgresql.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def tickets(client, db):
+    return ticket_service.get_ticket_service(redis.redis)
+
+
+@pytest.fixture
+def comments(client, db):
+    return comment_service.get_comment_service(redis.redis)
+
+
+@pytest.fixture
+def create_ticket(client):
+    def create(**fields):
+        body = {"title": "Printer is on fire", "email": "user@example.com", "created_by": "user", **fields}
+        response = client.post("/v1/ticket/", json=body)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
+
+
+@pytest.fixture
+def create_comment(client):
+    def create(ticket_id, **fields):
+        body = {"ticket_id": ticket_id, "body": "Any news?", "email": "user@example.com", "created_by": "user", **fields}
+        response = client.post("/v1/comment/", json=body)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create
@@ -0,0 +1,61 @@
+import uuid
+
+import orjson
+
+from src.services import bulk_import
+
+
+def ticket_record(**fields):
+    record = {"id": str(uuid.uuid4()), "title": "Printer is on fire", "email": "user@example.com", "created_by": "user"}
+    return orjson.dumps({**record, **fields}) + b"\n"
+
+
+def test_repeated_chunk_adds_nothing(client):
+    records = [ticket_record(version=3), ticket_record()]
+
+    result = bulk_import.load_chunk("tickets", 0, 0, records)
+    assert (result.loaded, result.skipped, result.error) == (2, 0, None)
+    # Чанк, загруженный до сбоя, но не отмеченный в checkpoint
+    result = bulk_import.load_chunk("tickets", 0, 0, records)
+    assert (result.loaded, result.skipped, result.error) == (0, 2, None)
+
+    ticket_id = orjson.loads(records[0])["id"]
+    response = client.get(f"/v1/ticket/{ticket_id}")
+    assert response.json()["version"] == 3
+    assert len(client.get("/v1/ticket/").json()) == 2
+
+
+def test_all_rejects_are_written(client, run, tmp_path):
+    source = tmp_path / "tickets.ndjson"
+    source.write_bytes(ticket_record() + b"not json\n" + ticket_record(email=None) + ticket_record())
+
+    loaded, rejected, failed = run(bulk_import.import_file("tickets", str(source), chunk_size=2, workers=1))
+    assert (loaded, rejected, failed) == (2, 2, 0)
+
+    lines = (tmp_path / "tickets.ndjson.rejects").read_bytes().splitlines()
+    # Чанки завершаются в любом порядке
+    rejects = sorted((orjson.loads(line) for line in lines), key=lambda reject: reject["record"])
+    assert [(reject["chunk"], reject["record"]) for reject in rejects] == [(0, 1), (1, 2)]
+    assert rejects[0]["source"] == "not json"
+
+
+def test_comment_of_unknown_ticket_is_rejected(client, run, create_ticket, tmp_path):
+    ticket = create_ticket()
+
+    def comment_record(ticket_id):
+        record = {"id": str(uuid.uuid4()), "ticket_id": ticket_id, "body": "Any news?", "email": "user@example.com"}
+        return orjson.dumps({**record, "created_by": "user"}) + b"\n"
+
+    source = tmp_path / "comments.ndjson"
+    orphan = comment_record(str(uuid.uuid4()))
+    source.write_bytes(comment_record(ticket["id"]) + orphan + comment_record(ticket["id"]))
+
+    loaded, rejected, failed = run(bulk_import.import_file("comments", str(source), chunk_size=10, workers=1))
+    assert (loaded, rejected, failed) == (2, 1, 0)
+    assert len(client.get(f"/v1/ticket/{ticket['id']}/comments").json()) == 2
+
+    reject, = [orjson.loads(line) for line in (tmp_path / "comments.ndjson.rejects").read_bytes().splitlines()]
+    assert (reject["record"], reject["source"]) == (1, orphan.decode().rstrip("\n"))
+    assert "foreign key" in reject["error"]
+    # Чанк отмечен: повторный запуск не загружает его снова
+    assert run(bulk_import.import_file("comments", str(source), chunk_size=10, workers=1)) == (0, 0, 0)
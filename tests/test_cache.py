@@ -0,0 +1,80 @@
+import asyncio
+import os
+
+import aioredis
+import pytest
+from pydantic import BaseModel
+
+from src.core.modules import Cache
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def cache(loop):
+    client = aioredis.from_url(f"redis://{os.environ['REDIS_HOST']}:{os.environ['REDIS_PORT']}/0")
+    loop.run_until_complete(client.flushdb())
+    yield Cache(db=client)
+    loop.run_until_complete(client.close())
+
+
+def test_fill_is_dropped_after_concurrent_invalidation(loop, cache):
+    async def load_during_write(keys):
+        # Запись в базу и сброс кэша происходят, пока читатель загружает старое значение
+        await cache.invalidate(keys)
+        return {key: Item(id=1, name="stale") for key in keys}
+
+    async def load(keys):
+        return {key: Item(id=1, name="fresh") for key in keys}
+
+    async def scenario():
+        item, = await cache.get_or_load_many(["items_1"], Item, load_during_write)
+        assert item.name == "stale"
+        assert await cache.db.get("items_1") is None
+
+        item, = await cache.get_or_load_many(["items_1"], Item, load)
+        assert item.name == "fresh"
+        assert await cache.db.get("items_1") is not None
+
+    loop.run_until_complete(scenario())
+
+
+def test_fill_is_dropped_after_dependency_invalidation(loop, cache):
+    async def load_during_parent_write(keys):
+        await cache.invalidate(["parents_1"])
+        return {key: Item(id=1, name="child") for key in keys}
+
+    async def scenario():
+        await cache.get_or_load_many(
+            ["items_1"], Item, load_during_parent_write, dependencies=lambda item: ["parents_1"],
+        )
+        assert await cache.db.get("items_1") is None
+
+    loop.run_until_complete(scenario())
+
+
+def test_raw_fill_is_guarded(loop, cache):
+    async def scenario():
+        since = await cache.now()
+        await cache.invalidate(["items_1"])
+        async with cache.batch() as batch:
+            batch.set_raw("items_1:raw", b"stale", dependencies=["items_1"], since=since)
+        assert await cache.db.get("items_1:raw") is None
+
+        since = await cache.now()
+        async with cache.batch() as batch:
+            batch.set_raw("items_1:raw", b"fresh", dependencies=["items_1"], since=since)
+        assert await cache.db.get("items_1:raw") == b"fresh"
+        assert await cache.db.smembers("deps:items_1") == {b"items_1:raw"}
+
+    loop.run_until_complete(scenario())
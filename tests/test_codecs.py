@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.core.codecs import COMPRESSED_FLAG, Codec, CacheSerializer
+
+
+VALUE = {"id": str(uuid.uuid4()), "created_at": datetime(2021, 8, 1).isoformat(), "body": "x" * 2048}
+
+
+@pytest.mark.parametrize("codec", ["orjson", "msgpack"])
+def test_values_are_compressed(codec):
+    serializer = CacheSerializer(codec, compress_min_size=1024)
+    data = serializer.dumps(VALUE)
+
+    assert data[1] & COMPRESSED_FLAG
+    assert len(data) < 1024
+    assert serializer.loads(data) == VALUE
+    # Значение читается по собственному заголовку при любом кодеке новых значений
+    assert CacheSerializer().loads(data) == VALUE
+
+
+def test_codec_must_implement_methods():
+    class Incomplete(Codec):
+        def dumps(self, obj):
+            return b""
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,24 @@
+from src.db import postgresql
+from src.schemas.comment import CommentCreate
+from src.services import comment_queue
+from src.services.crud import comment as comment_service
+from src.services.crud.comment import COMMENT_STREAM
+
+
+def test_dead_lettered_comment_leaves_the_cache(monkeypatch, run, db, comments, create_ticket):
+    monkeypatch.setattr(comment_service.app_config, "comment_queue_enabled", True)
+    ticket = create_ticket()
+    comment_in = CommentCreate(ticket_id=ticket["id"], body="Any news?", email="user@example.com", created_by="user")
+    comment = run(comments.create_queued(db, obj_in=comment_in))
+    # Автор видит комментарий из ожидающей копии, запись попадает в кэш
+    assert run(comments.get_full(db, comment.id)) is not None
+
+    redis = comments.cache.db
+    run(comment_queue.ensure_group(redis))
+    messages = run(redis.xrange(COMMENT_STREAM))
+    exhausted = {message_id for message_id, _ in messages}
+    run(comment_queue.process_messages(redis, postgresql.database, comments, messages, exhausted))
+
+    comment_key = comments.cache.make_key(comments.model.__tablename__, comment.id)
+    assert run(redis.get(comment_key)) is None
+    assert run(comments.get_full(db, comment.id)) is None
@@ -0,0 +1,177 @@
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from src.api.v1 import ticket as ticket_api
+from src.core import exceptions
+from src.db import postgresql
+
+
+def test_create_and_list_tickets(client, create_ticket):
+    ticket = create_ticket()
+
+    response = client.get("/v1/ticket/")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [ticket["id"]]
+
+
+def test_ticket_comments_and_history(client, create_ticket, create_comment):
+    ticket = create_ticket()
+    comment = create_comment(ticket["id"])
+
+    response = client.get(f"/v1/ticket/{ticket['id']}/comments")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [comment["id"]]
+
+    response = client.get(f"/v1/ticket/{ticket['id']}/history")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_uuid_values_are_plain(run, db, tickets, create_ticket):
+    ticket = create_ticket()
+
+    db_obj = run(tickets.get(db, uuid.UUID(ticket["id"])))
+    assert type(db_obj.id) is uuid.UUID
+
+
+def test_remove_missing_ticket(run, db, tickets):
+    with pytest.raises(exceptions.ObjectNotFound):
+        run(tickets.remove(db, item_id=uuid.uuid4()))
+
+
+def test_get_ticket_with_comments(client, create_ticket, create_comment):
+    ticket = create_ticket()
+    first = create_comment(ticket["id"], body="first")
+    second = create_comment(ticket["id"], body="second")
+
+    response = client.get(f"/v1/ticket/{ticket['id']}")
+    assert response.status_code == 200
+    body = response.json()
+    assert [comment["id"] for comment in body["comments"]] == [second["id"], first["id"]]
+    assert body["comments_count"] == 2
+
+    response = client.get(f"/v1/ticket/{ticket['id']}", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+
+
+def test_update_ticket_writes_history(client, create_ticket):
+    ticket = create_ticket()
+
+    response = client.put(f"/v1/ticket/{ticket['id']}", json={"status": "answered", "updated_by": "admin"})
+    assert response.status_code == 200, response.text
+    assert response.json()["status"] == "answered"
+    assert response.json()["version"] == ticket["version"] + 1
+
+    response = client.get(f"/v1/ticket/{ticket['id']}/history")
+    assert response.status_code == 200
+    assert [(item["version"], item["status"]) for item in response.json()] == [(ticket["version"], "open")]
+
+
+def test_delete_ticket(client, create_ticket):
+    ticket = create_ticket()
+
+    assert client.delete(f"/v1/ticket/{ticket['id']}").status_code == 200
+    assert client.get(f"/v1/ticket/{ticket['id']}").status_code == 404
+    assert client.delete(f"/v1/ticket/{ticket['id']}").status_code == 404
+
+
+def test_deleted_ticket_drops_cached_comments(client, create_ticket, create_comment):
+    ticket = create_ticket()
+    comment = create_comment(ticket["id"])
+    assert client.get(f"/v1/comment/{comment['id']}").status_code == 200
+
+    assert client.delete(f"/v1/ticket/{ticket['id']}").status_code == 200
+    assert client.get(f"/v1/comment/{comment['id']}").status_code == 404
+
+
+def test_update_is_conditional_on_read_version(client, run, db, tickets, create_ticket):
+    ticket = create_ticket()
+    stale = run(tickets.get(db, uuid.UUID(ticket["id"])))
+
+    response = client.put(f"/v1/ticket/{ticket['id']}", json={"status": "answered", "updated_by": "admin"})
+    assert response.status_code == 200
+
+    update = {"status": "closed", "updated_by": "admin"}
+    with pytest.raises(exceptions.PreconditionFailed):
+        run(tickets.update(db, db_obj=stale, obj_in=update, expected_version=ticket["version"]))
+
+    response = client.get(f"/v1/ticket/{ticket['id']}/history")
+    assert [item["version"] for item in response.json()] == [ticket["version"]]
+    assert client.get(f"/v1/ticket/{ticket['id']}").json()["status"] == "answered"
+
+
+def test_update_with_if_match(client, create_ticket):
+    ticket = create_ticket()
+    etag = client.get(f"/v1/ticket/{ticket['id']}").headers["ETag"]
+    update = {"status": "answered", "updated_by": "admin"}
+
+    assert client.put(f"/v1/ticket/{ticket['id']}", json=update, headers={"If-Match": etag}).status_code == 200
+    update["status"] = "closed"
+    assert client.put(f"/v1/ticket/{ticket['id']}", json=update, headers={"If-Match": etag}).status_code == 412
+
+
+def test_full_response_is_not_cached_after_concurrent_write(monkeypatch, run, db, tickets, create_ticket):
+    ticket = create_ticket()
+    ticket_key = tickets.cache.make_key(tickets.model.__tablename__, ticket["id"])
+    get_full = tickets.get_full
+
+    async def get_full_during_write(db, item_id):
+        loaded = await get_full(db, item_id)
+        # Тикет изменен и кэш сброшен, пока читатель собирает ответ
+        await tickets.cache.invalidate([ticket_key])
+        return loaded
+
+    monkeypatch.setattr(tickets, "get_full", get_full_during_write)
+    assert run(tickets.get_full_response(db, uuid.UUID(ticket["id"]))) is not None
+    assert run(tickets.cache.db.get(tickets.cache.make_raw_key(ticket_key))) is None
+
+
+def test_bulk_create_limits(monkeypatch, client):
+    monkeypatch.setattr(ticket_api.app_config, "ticket_bulk_max_items", 2)
+    ticket = {"title": "Printer is on fire", "email": "user@example.com", "created_by": "user"}
+
+    response = client.post("/v1/ticket/bulk", json=[ticket, ticket])
+    assert response.status_code == 200, response.text
+    assert len(response.json()["ids"]) == 2
+
+    assert client.post("/v1/ticket/bulk", json=[ticket] * 3).status_code == 413
+    assert len(client.get("/v1/ticket/").json()) == 2
+
+    monkeypatch.setattr(ticket_api.app_config, "ticket_bulk_max_body_bytes", 100)
+    assert client.post("/v1/ticket/bulk", json=[ticket, ticket]).status_code == 413
+
+
+@pytest.mark.parametrize("expired", [None, ["title", "description", "email"]])
+def test_update_of_expired_ticket_loads_it_once(expired, backend, run, db, tickets, create_ticket):
+    if backend != "session":
+        pytest.skip("history rows are written by the ORM session")
+    ticket = create_ticket()
+    db_obj = run(tickets.get(db, uuid.UUID(ticket["id"])))
+    # `None` - просрочены все колонки, их читает проверка версии в `update`;
+    # иначе только неизмененные колонки, их читает запись истории
+    db.expire(db_obj, expired)
+
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    event.listen(postgresql.engine, "before_cursor_execute", count)
+    try:
+        if expired:
+            # Значения не изменились: история не пишется и просроченные колонки не читаются
+            db_obj.status = db_obj.status
+            db.flush()
+            assert statements == []
+
+        run(tickets.update(db, db_obj=db_obj, obj_in={"status": "answered", "updated_by": "admin"}))
+    finally:
+        event.remove(postgresql.engine, "before_cursor_execute", count)
+
+    # Одно чтение просроченного тикета, строка истории и UPDATE
+    assert sorted(statements) == ["INSERT", "SELECT", "UPDATE"]
+    history, _ = run(tickets.history(db, item_id=uuid.UUID(ticket["id"])))
+    versions = [(item.version, item.status.value, item.title) for item in history]
+    assert versions == [(ticket["version"], "open", ticket["title"])]
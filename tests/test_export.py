@@ -0,0 +1,27 @@
+import csv
+import io
+
+import orjson
+
+
+def test_export_ndjson_with_comments(client, create_ticket, create_comment):
+    first = create_ticket()
+    second = create_ticket(title="Scanner is jammed")
+    comments = [create_comment(first["id"], body="first")["id"], create_comment(first["id"], body="second")["id"]]
+
+    response = client.get("/v1/ticket/export", params={"include": "comments"})
+    assert response.status_code == 200, response.text
+    rows = [orjson.loads(line) for line in response.content.splitlines()]
+    assert [row["id"] for row in rows] == [first["id"], second["id"]]
+    assert rows[0]["version"] == first["version"]
+    assert [comment["id"] for comment in rows[0]["comments"]] == comments
+    assert rows[1]["comments"] == []
+
+
+def test_export_csv(client, create_ticket):
+    ticket = create_ticket()
+
+    response = client.get("/v1/ticket/export", params={"format": "csv"})
+    assert response.status_code == 200, response.text
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row["id"], row["status"], row["version"]) for row in rows] == [(ticket["id"], "open", str(ticket["version"]))]
@@ -0,0 +1,55 @@
+import csv
+
+import pytest
+
+from src.db import postgresql
+from src.services import history_partitions
+
+
+PARTITION = "tickets_history_2020_01"
+
+
+@pytest.fixture
+def old_partition(client, create_ticket):
+    ticket = create_ticket()
+    client.put(f"/v1/ticket/{ticket['id']}", json={"status": "closed", "updated_by": "admin"})
+    with postgresql.engine.begin() as connection:
+        connection.execute(
+            f"CREATE TABLE {PARTITION} PARTITION OF tickets_history FOR VALUES FROM ('2020-01-01') TO ('2020-02-01')"
+        )
+        connection.execute("UPDATE tickets_history SET changed = '2020-01-15'")
+    yield ticket
+    with postgresql.engine.begin() as connection:
+        connection.execute(f"DROP TABLE IF EXISTS {PARTITION}")
+
+
+@pytest.fixture
+def session():
+    db = postgresql.SessionLocal()
+    yield db
+    db.close()
+
+
+def exported_ids(path):
+    with open(path, newline="") as export_file:
+        return [row["id"] for row in csv.DictReader(export_file)]
+
+
+def test_failed_export_keeps_partition(old_partition, session, tmp_path):
+    with pytest.raises(OSError):
+        history_partitions.archive_partitions(session, 1, str(tmp_path / "missing"))
+    assert PARTITION in history_partitions.list_partitions(session).values()
+
+    assert history_partitions.archive_partitions(session, 1, str(tmp_path)) == [PARTITION]
+    assert PARTITION not in history_partitions.list_partitions(session).values()
+    assert exported_ids(tmp_path / f"{PARTITION}.csv") == [old_partition["id"]]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_detached_partition_is_exported_later(old_partition, session, tmp_path):
+    assert history_partitions.archive_partitions(session, 1) == [PARTITION]
+    assert PARTITION in history_partitions.list_detached_partitions(session).values()
+
+    assert history_partitions.archive_partitions(session, 1, str(tmp_path)) == [PARTITION]
+    assert not history_partitions.list_detached_partitions(session)
+    assert exported_ids(tmp_path / f"{PARTITION}.csv") == [old_partition["id"]]
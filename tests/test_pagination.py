@@ -0,0 +1,35 @@
+def test_cursor_pages(client, create_ticket):
+    created = [create_ticket()["id"] for _ in range(3)]
+
+    response = client.get("/v1/ticket/", params={"page[size]": 2, "page[after]": ""})
+    assert response.status_code == 200
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/v1/ticket/", params={"page[size]": 2, "page[after]": cursor})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == created[2:]
+
+
+def test_cursor_is_bound_to_sort(client, create_ticket):
+    for _ in range(2):
+        create_ticket()
+
+    response = client.get("/v1/ticket/", params={"page[size]": 1, "page[after]": "", "sort": "created_at"})
+    cursor = response.headers["X-Next-Cursor"]
+
+    for sort in ("updated_at", "-created_at"):
+        response = client.get("/v1/ticket/", params={"page[size]": 1, "page[after]": cursor, "sort": sort})
+        assert response.status_code == 400, sort
+
+
+def test_filter_by_status(client, create_ticket):
+    open_ticket = create_ticket()
+    closed_ticket = create_ticket()
+    response = client.put(f"/v1/ticket/{closed_ticket['id']}", json={"status": "closed", "updated_by": "admin"})
+    assert response.status_code == 200, response.text
+
+    response = client.get("/v1/ticket/", params={"filter[active]": "true"})
+    assert [item["id"] for item in response.json()] == [open_ticket["id"]]
+
+    response = client.get("/v1/ticket/", params={"filter[status]": "closed"})
+    assert [item["id"] for item in response.json()] == [closed_ticket["id"]]
@@ -0,0 +1,32 @@
+from sqlalchemy import func, select
+
+from src.db import postgresql
+from src.models import tickets as ticket_model
+
+
+def test_search_ranks_tickets_and_comments(client, create_ticket, create_comment):
+    by_title = create_ticket(title="Printer jammed")
+    by_comment = create_ticket(title="Office supplies")
+    create_comment(by_comment["id"], body="the printer again")
+    create_ticket(title="Coffee machine")
+
+    response = client.get("/v1/ticket/search", params={"q": "printer"})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [by_title["id"], by_comment["id"]]
+
+    response = client.get("/v1/ticket/search", params={"q": "printer", "page[size]": 1, "page[number]": 1})
+    assert [item["id"] for item in response.json()] == [by_comment["id"]]
+
+
+def test_search_uses_expression_indexes():
+    tsquery = func.websearch_to_tsquery(ticket_model.SEARCH_CONFIG, "printer")
+    queries = [
+        select([ticket_model.Ticket.__table__.c.id]).where(ticket_model.ticket_search_vector.op('@@')(tsquery)),
+        select([ticket_model.Comment.__table__.c.id]).where(ticket_model.comment_search_vector.op('@@')(tsquery)),
+    ]
+    with postgresql.engine.begin() as connection:
+        connection.execute("SET LOCAL enable_seqscan = off")
+        for query, index in zip(queries, ("ix_tickets_search_vector", "ix_comments_search_vector")):
+            compiled = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+            plan = "\n".join(row[0] for row in connection.execute(f"EXPLAIN {compiled}"))
+            assert index in plan
@@ -0,0 +1,56 @@
+import threading
+
+from src.db import postgresql
+from src.models import tickets as ticket_model
+from src.services.crud.ticket import TicketService
+
+
+def reconcile() -> dict:
+    session = postgresql.SessionLocal()
+    try:
+        return TicketService(ticket_model.Ticket).reconcile_stats(session)
+    finally:
+        session.close()
+
+
+def test_stats(client, create_ticket):
+    create_ticket()
+    closed = create_ticket()
+    client.put(f"/v1/ticket/{closed['id']}", json={"status": "closed", "updated_by": "admin"})
+
+    response = client.get("/v1/ticket/stats")
+    assert response.status_code == 200
+    assert response.json() == {"open": 1, "answered": 0, "wait_answer": 0, "closed": 1, "total": 2}
+
+
+def test_reconcile_stats_repairs_drift(client, run, create_ticket):
+    create_ticket()
+    with postgresql.engine.begin() as connection:
+        connection.execute("INSERT INTO ticket_counters (status, shard, count) VALUES ('CLOSED', 1, 3)")
+
+    assert run(reconcile()) == {"closed": -3}
+    assert client.get("/v1/ticket/stats").json()["total"] == 1
+    assert run(reconcile()) == {}
+
+
+def test_reconcile_stats_does_not_block_writers(client, run, create_ticket):
+    create_ticket()
+    connection = postgresql.engine.connect()
+    transaction = connection.begin()
+    try:
+        # Незавершенная запись: блокировка таблицы тикетов ждала бы ее завершения
+        connection.execute(
+            "INSERT INTO tickets (id, title, email, status, created_by, updated_by, version, created_at, updated_at) "
+            "VALUES (gen_random_uuid(), 'x', 'user@example.com', 'OPEN', 'user', 'user', 1, now(), now())"
+        )
+        result = {}
+        worker = threading.Thread(target=lambda: result.update(drift=run(reconcile())))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+        assert result["drift"] == {}
+        transaction.commit()
+    finally:
+        connection.close()
+
+    assert client.get("/v1/ticket/stats").json()["open"] == 2